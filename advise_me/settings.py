@@ -9,6 +9,7 @@ https://docs.djangoproject.com/en/3.2/topics/settings/
 For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.2/ref/settings/
 """
+import os
 from datetime import timedelta
 from pathlib import Path
 
@@ -51,6 +52,7 @@ MIDDLEWARE = [
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'users.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -64,12 +66,24 @@ REST_FRAMEWORK = {
     'NONE_FILED_ERROR_KEYS': 'error',
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.CachedJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': (
         #'rest_framework.permissions.AllowAny',
-        'rest_framework.permissions.IsAuthenticatedOrReadOnly'
-    )
+        'rest_framework.permissions.IsAuthenticatedOrReadOnly',
+    ),
+    'DEFAULT_PAGINATION_CLASS': 'users.pagination.IdCursorPagination',
+    'PAGE_SIZE': 20,
+    # orjson backed, same output as the stdlib JSON classes which they fall back to without orjson
+    'DEFAULT_RENDERER_CLASSES': [
+        'users.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'users.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
 }
 
 SIMPLE_JWT = {
@@ -87,6 +101,14 @@ SIMPLE_JWT = {
     'TOKEN_TYPE_CLAIM': 'token_type',
 }
 
+# seconds an authenticated user stays cached, saves to the user drop it straight away
+AUTH_USER_CACHE_TIMEOUT = 300
+
+# how often each process re-reads newly blacklisted refresh tokens into its in-memory filter
+TOKEN_BLACKLIST_SYNC_SECONDS = 5
+# and how often it reloads all of them, bounding how long a late committed row can be missed
+TOKEN_BLACKLIST_REBUILD_SECONDS = 300
+
 ROOT_URLCONF = 'advise_me.urls'
 
 TEMPLATES = [
@@ -118,6 +140,38 @@ DATABASES = {
     }
 }
 
+# Read replicas: list and retrieve views read from these aliases, writes and everything else use
+# default (users/routers.py). SQLITE_REPLICAS=<n> adds n file-backed replicas for local testing,
+# `python manage.py sync_replicas` copies db.sqlite3 into them.
+DATABASE_REPLICAS = []
+for number in range(1, int(os.environ.get('SQLITE_REPLICAS', 0)) + 1):
+    DATABASES[f'replica{number}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.replica{number}.sqlite3',
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{number}')
+
+DATABASE_ROUTERS = ['users.routers.ReplicaRouter']
+
+# how long a user reads from default after a write, keep it above the replication lag
+REPLICA_PIN_SECONDS = 5
+
+# most credits a student can register in one semester, compared with credit_summary's
+# total_max_credit (the sum of the registered courses' maximum_credit)
+MAX_SEMESTER_CREDITS = 24
+
+
+# Cache
+# Use a shared backend (memcached, redis) when running more than one worker process so
+# that cache invalidation reaches every worker.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
@@ -163,4 +217,18 @@ STATIC_URL = '/static/'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 MEDIA_ROOT = MEDIA_DIR
 MEDIA_URL = '/media/'
+
+# profile picture uploads, checked while they stream in
+PROFILE_PICTURE_MAX_BYTES = 5 * 2 ** 20
+PROFILE_PICTURE_MAX_DIMENSION = 6000
+PROFILE_PICTURE_MAX_PIXELS = 24_000_000
 AUTH_USER_MODEL = 'users.CustomUser'
+AUTHENTICATION_BACKENDS = [
+    'users.backends.EmailBackend',
+    'django.contrib.auth.backends.ModelBackend',
+]
+
+# worker threads for register/login/change_password, caps concurrent password hashing
+PASSWORD_HASHING_WORKERS = 4
+# worker threads for the catalogue and profile read endpoints
+READ_VIEW_WORKERS = 16
@@ -0,0 +1,38 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .caching import bump_version_on_commit, get_version
+
+
+# bump when CustomUser's fields change so pickled users from the old schema are ignored
+USER_CACHE_SCHEMA = 1
+
+
+# each user has their own version in the key, a change bumps it so the cached copy is never read again
+def user_cache_key(user_id):
+    return f'auth_user:{USER_CACHE_SCHEMA}:{user_id}:{get_version(f"auth_user:{user_id}")}'
+
+
+# bumped once the write commits, see bump_version_on_commit
+def invalidate_cached_user(user_id):
+    bump_version_on_commit(f'auth_user:{user_id}')
+
+
+# JWT authentication that keeps the token's user in the cache, invalidated whenever the user row is saved
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            # raises for missing and inactive users, so only active users are cached
+            user = super().get_user(validated_token)
+            cache.set(key, user, getattr(settings, 'AUTH_USER_CACHE_TIMEOUT', 300))
+        return user
@@ -0,0 +1,23 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+
+User = get_user_model()
+
+
+# authenticate with email and password in a single user lookup
+
+class EmailBackend(ModelBackend):
+    def authenticate(self, request, email=None, password=None, **kwargs):
+        if email is None or password is None:
+            return None
+
+        user = User._default_manager.filter(email=email).order_by('pk').first()
+        if user is None:
+            # run the hasher anyway so unknown emails take as long as wrong passwords
+            User().set_password(password)
+            return None
+
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
@@ -0,0 +1,177 @@
+import gzip
+import hashlib
+import json
+import time
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+from django.views.decorators.http import condition
+from django.views.decorators.vary import vary_on_headers
+from rest_framework import status
+from rest_framework.exceptions import NotAcceptable
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from .routers import replica_reads
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+# cached responses live under a version per namespace, bumping it on writes makes every
+# old entry unreachable without having to find and delete them
+
+def get_version(namespace):
+    return cache.get_or_set(f'{namespace}:version', time.time_ns, None)
+
+
+def bump_version(namespace):
+    cache.set(f'{namespace}:version', time.time_ns(), None)
+
+
+# writes bump once their transaction commits, an earlier bump would let a concurrent cache miss
+# render the pre-commit rows under the new version
+def bump_version_on_commit(namespace):
+    transaction.on_commit(lambda: bump_version(namespace))
+
+
+def make_etag(data):
+    content = json.dumps(data, cls=JSONEncoder, separators=(',', ':')).encode()
+    return f'"{hashlib.sha256(content).hexdigest()[:32]}"'
+
+
+# content codings a cached page can be stored in, in order of preference at equal quality.
+# brotli is optional, without it clients get gzip.
+def _gzip(content):
+    return gzip.compress(content, compresslevel=9, mtime=0)
+
+
+COMPRESSORS = {'gzip': _gzip}
+if brotli is not None:
+    COMPRESSORS = {'br': lambda content: brotli.compress(content, quality=11), **COMPRESSORS}
+
+# shorter bodies go out uncompressed, as with GZipMiddleware
+MIN_COMPRESS_LENGTH = 200
+
+
+# the best coding we can produce for an Accept-Encoding header, 'identity' if there is none
+def preferred_encoding(accept_encoding):
+    qualities = {}
+    for part in accept_encoding.split(','):
+        coding, _, params = part.partition(';')
+        coding, params = coding.strip().lower(), params.strip().replace(' ', '')
+        if not coding:
+            continue
+        try:
+            qualities[coding] = float(params[2:]) if params.startswith('q=') else 1.0
+        except ValueError:
+            qualities[coding] = 0.0
+
+    best, best_quality = 'identity', qualities.get('identity', 0.0)
+    for coding in COMPRESSORS:
+        quality = qualities.get(coding, qualities.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+# list view mixin that serves the serialized page from the cache, with a strong ETag and 304s.
+# JSON responses are cached rendered, once per content version and per content coding, so a hit
+# does no serializing, rendering or compressing. Other renderers (the browsable API, indented
+# JSON) render the cached data on every request.
+class VersionedCacheMixin:
+    cache_namespace = None
+    cache_timeout = 60 * 60
+
+    def list(self, request, *args, **kwargs):
+        key = f'{self.cache_namespace}:{get_version(self.cache_namespace)}:{request.build_absolute_uri()}'
+        renderer = request.accepted_renderer
+        if renderer.format != 'json' or renderer.get_indent(request.accepted_media_type, {}) is not None:
+            data, etag = self.get_cached_data(key, request, *args, **kwargs)
+            response = self.not_modified(request, etag) or Response(data, headers={'ETag': etag})
+        else:
+            encoding = preferred_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+            variant_key = f'{key}:{renderer.media_type}:{encoding}'
+            variant = cache.get(variant_key)
+            if variant is None:
+                variant = self.render_variant(renderer, encoding, key, request, *args, **kwargs)
+                cache.set(variant_key, variant, self.cache_timeout)
+
+            content, etag, encoding = variant
+            response = self.not_modified(request, etag)
+            if response is None:
+                response = HttpResponse(content, content_type=renderer.media_type)
+                response['ETag'] = etag
+                if encoding != 'identity':
+                    response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    def get_cached_data(self, key, request, *args, **kwargs):
+        cached = cache.get(key)
+        if cached is None:
+            # fill from the primary, a lagging replica would cache stale rows under the new version
+            with replica_reads(False):
+                response = super().list(request, *args, **kwargs)
+            cached = (response.data, make_etag(response.data))
+            cache.set(key, cached, self.cache_timeout)
+        return cached
+
+    # each coding is its own representation, so it gets its own ETag
+    def render_variant(self, renderer, encoding, key, request, *args, **kwargs):
+        data, etag = self.get_cached_data(key, request, *args, **kwargs)
+        content = renderer.render(data, request.accepted_media_type, self.get_renderer_context())
+        if encoding == 'identity' or len(content) < MIN_COMPRESS_LENGTH:
+            return content, etag, 'identity'
+        return COMPRESSORS[encoding](content), f'{etag[:-1]}-{encoding}"', encoding
+
+    def not_modified(self, request, etag):
+        if_none_match = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        if etag in if_none_match or '*' in if_none_match:
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+
+# what besides the row decides the body: the renderer the view will pick (the default renderer
+# classes, which the conditional views keep) and the normalised ?fields= / ?expand= paths.
+# None when no renderer is acceptable, the view answers that with a 406.
+def representation_tag(request):
+    renderers = [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES]
+    try:
+        request = request if isinstance(request, Request) else Request(request)
+        renderer, media_type = DefaultContentNegotiation().select_renderer(request, renderers)
+    except NotAcceptable:
+        return None
+    parts = [media_type]
+    for param in ('fields', 'expand'):
+        if param in request.query_params:
+            paths = sorted({path.strip() for path in request.query_params[param].split(',') if path.strip()})
+            parts.append(f'{param}={",".join(paths)}')
+    return f'{renderer.format}-{hashlib.sha256("&".join(parts).encode()).hexdigest()[:12]}'
+
+
+# Last-Modified/ETag for a single object from its updated_date column. The column is read once
+# per request and a matching If-Modified-Since/If-None-Match returns 304 before the view runs.
+# The ETag also names the representation, so a sparse or HTML response never validates a full
+# JSON one, and Vary: Accept keeps Last-Modified revalidation to one renderer.
+def updated_date_condition(model):
+    def updated_date(request, pk):
+        if not hasattr(request, '_updated_date'):
+            request._updated_date = model.objects.filter(pk=pk).values_list('updated_date', flat=True).first()
+        return request._updated_date
+
+    def etag(request, pk):
+        updated = updated_date(request, pk)
+        tag = representation_tag(request)
+        if updated is not None and tag is not None:
+            return f'"{model._meta.model_name}-{pk}-{updated.timestamp():.6f}-{tag}"'
+
+    def decorator(view):
+        return vary_on_headers('Accept')(condition(etag_func=etag, last_modified_func=updated_date)(view))
+
+    return decorator
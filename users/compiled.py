@@ -0,0 +1,109 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, PrimaryKeyRelatedField
+from rest_framework.response import Response
+
+
+# read only fast path for flat ModelSerializers: the readable fields are turned into
+# .values() columns once per request and each row is mapped straight to the output dict,
+# skipping model instantiation and the per field get_attribute/to_representation calls.
+
+# fields whose to_representation returns database values unchanged
+IDENTITY_FIELDS = (serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+                   serializers.ReadOnlyField, PrimaryKeyRelatedField)
+
+
+def _is_identity(field):
+    return any(type(field).to_representation is cls.to_representation for cls in IDENTITY_FIELDS)
+
+
+def _model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+class CompiledSerializer:
+    def __init__(self, model, columns, converters, many_related):
+        self.model = model
+        self.pk_name = model._meta.pk.attname
+        self.columns = columns
+        self.converters = converters
+        self.many_related = many_related
+
+    # extra columns (the pagination ordering) are fetched but left out of the output
+    def values(self, queryset, extra=()):
+        columns = [column for _, column in self.columns]
+        extra = [column for column in (self.pk_name, *extra) if column not in columns]
+        return queryset.prefetch_related(None).values(*columns, *extra)
+
+    def to_representation(self, rows):
+        columns, converters = self.columns, self.converters
+        data = []
+        for row in rows:
+            item = {name: row[column] for name, column in columns}
+            for name, convert in converters:
+                value = item[name]
+                if value is not None:
+                    item[name] = convert(value)
+            data.append(item)
+        if self.many_related and data:
+            self._add_many_related(rows, data)
+        return data
+
+    # one query per many to many field for the whole page, in place of prefetch_related
+    def _add_many_related(self, rows, data):
+        pks = [row[self.pk_name] for row in rows]
+        for name, model_field in self.many_related:
+            through = model_field.remote_field.through
+            source = through._meta.get_field(model_field.m2m_field_name()).attname
+            target = through._meta.get_field(model_field.m2m_reverse_field_name()).attname
+            related = {pk: [] for pk in pks}
+            links = through.objects.filter(**{f'{source}__in': pks}).order_by('pk').values_list(source, target)
+            for pk, target_pk in links:
+                related[pk].append(target_pk)
+            for row, item in zip(rows, data):
+                item[name] = related[row[self.pk_name]]
+
+
+# returns None when a readable field is not a plain column or a primary key list (nested
+# serializers, method fields, dotted sources) so the caller falls back to the regular serializer
+def compile_serializer(serializer):
+    model = serializer.Meta.model
+    columns, converters, many_related = [], [], []
+    for field in serializer._readable_fields:
+        if isinstance(field, serializers.BaseSerializer) or '.' in field.source or field.source == '*':
+            return None
+        model_field = _model_field(model, field.source)
+        if isinstance(field, ManyRelatedField):
+            if not isinstance(field.child_relation, PrimaryKeyRelatedField) or model_field is None \
+                    or not model_field.many_to_many or model_field.auto_created:
+                return None
+            many_related.append((field.field_name, model_field))
+            continue
+        if model_field is None or not model_field.concrete:
+            return None
+        columns.append((field.field_name, field.source))
+        if not _is_identity(field):
+            converters.append((field.field_name, field.to_representation))
+    return CompiledSerializer(model, columns, converters, many_related)
+
+
+# list view mixin that serves the page through compile_serializer when the serializer allows it,
+# the response is the same as the regular ListAPIView one
+class CompiledListMixin:
+    def list(self, request, *args, **kwargs):
+        compiled = compile_serializer(self.get_serializer())
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = ()
+        if self.paginator is not None and hasattr(self.paginator, 'get_ordering'):
+            ordering = [name.lstrip('-') for name in self.paginator.get_ordering(request, queryset, self)]
+        rows = compiled.values(queryset, ordering)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(compiled.to_representation(page))
+        return Response(compiled.to_representation(list(rows)))
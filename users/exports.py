@@ -0,0 +1,60 @@
+import csv
+import json
+import tempfile
+from rest_framework.utils.encoders import JSONEncoder
+
+
+CONTENT_TYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+
+# file-like object that hands back what csv.writer writes instead of buffering it
+class Echo:
+    def write(self, value):
+        return value
+
+
+# nested blocks become prefixed columns, e.g. user__username
+def flatten(data, prefix=''):
+    row = {}
+    for key, value in data.items():
+        name = f'{prefix}{key}'
+        if isinstance(value, dict):
+            row.update(flatten(value, f'{name}__'))
+        else:
+            row[name] = value
+    return row
+
+
+def stream_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=JSONEncoder) + '\n'
+
+
+# the header comes from the first row, so serializers must give every row the same keys. A
+# column the first row lacks raises instead of being dropped from the export
+def stream_csv(rows):
+    writer = None
+    for row in rows:
+        row = flatten(row)
+        if writer is None:
+            writer = csv.DictWriter(Echo(), fieldnames=list(row), extrasaction='raise')
+            yield writer.writeheader()
+        yield writer.writerow(row)
+
+
+# writes a stream out to a temporary file (in memory while it is small) and rewinds it
+def spool(chunks, max_size=1024 * 1024):
+    spooled = tempfile.SpooledTemporaryFile(max_size=max_size)
+    for chunk in chunks:
+        spooled.write(chunk.encode())
+    spooled.seek(0)
+    return spooled
+
+
+STREAMERS = {
+    'ndjson': stream_ndjson,
+    'csv': stream_csv,
+}
@@ -0,0 +1,19 @@
+from django.core.exceptions import ValidationError as DjangoValidationError
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend
+
+
+# exact match filtering from query parameters, views declare filter_fields as {param: lookup}
+
+class QueryParamFilterBackend(BaseFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        filters = {}
+        for param, lookup in getattr(view, 'filter_fields', {}).items():
+            value = request.query_params.get(param)
+            if value is not None:
+                filters[lookup] = value
+        try:
+            return queryset.filter(**filters)
+        except (ValueError, DjangoValidationError):
+            raise ValidationError({param: 'Invalid value' for param in getattr(view, 'filter_fields', {})
+                                   if param in request.query_params})
@@ -0,0 +1,73 @@
+import logging
+import posixpath
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+
+logger = logging.getLogger(__name__)
+
+# longest side in pixels of each derivative, largest first so smaller ones resize from it
+DERIVATIVE_SIZES = {'medium': 480, 'small': 160, 'thumb': 64}
+
+# output format -> (Pillow format, file extension), WebP only where Pillow was built with it
+DERIVATIVE_FORMATS = {'jpeg': ('JPEG', 'jpg')}
+if features.check('webp'):
+    DERIVATIVE_FORMATS['webp'] = ('WEBP', 'webp')
+
+
+def derivative_name(name, size, output):
+    directory, filename = posixpath.split(name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join('derivatives', directory, f'{stem}_{size}.{DERIVATIVE_FORMATS[output][1]}')
+
+
+# derivatives are plain files in the default storage, keyed by the picture's (hashed) name
+def has_derivatives(field_file):
+    return default_storage.exists(derivative_name(field_file.name, 'thumb', 'jpeg'))
+
+
+# write every size and format of an uploaded picture next to it under derivatives/
+def generate_derivatives(field_file):
+    with field_file.open('rb'):
+        image = Image.open(field_file)
+        # let the JPEG decoder downscale while decoding instead of loading the full camera image
+        image.draft('RGB', (DERIVATIVE_SIZES['medium'], DERIVATIVE_SIZES['medium']))
+        image = ImageOps.exif_transpose(image).convert('RGB')
+
+    for size, pixels in DERIVATIVE_SIZES.items():
+        image.thumbnail((pixels, pixels), Image.LANCZOS)
+        for output, (image_format, extension) in DERIVATIVE_FORMATS.items():
+            buffer = BytesIO()
+            image.save(buffer, image_format, quality=80)
+            name = derivative_name(field_file.name, size, output)
+            if default_storage.exists(name):
+                default_storage.delete(name)
+            default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def ensure_derivatives(field_file, force=False):
+    if not field_file or (not force and has_derivatives(field_file)):
+        return
+    try:
+        generate_derivatives(field_file)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        logger.warning('Could not generate derivatives for %s', field_file.name, exc_info=True)
+
+
+# {size: {format: url}} for a picture, built from names plus one exists() check on the thumb.
+# Same keys with None urls when there is no picture or its derivatives failed to generate, so every
+# row has one shape (CSV exports rely on it) and clients never get a url that 404s
+def derivative_urls(field_file, request=None):
+    generated = bool(field_file) and has_derivatives(field_file)
+    urls = {}
+    for size in DERIVATIVE_SIZES:
+        urls[size] = {}
+        for output in DERIVATIVE_FORMATS:
+            if not generated:
+                urls[size][output] = None
+                continue
+            url = default_storage.url(derivative_name(field_file.name, size, output))
+            urls[size][output] = request.build_absolute_uri(url) if request is not None else url
+    return urls
@@ -0,0 +1,221 @@
+import csv
+import io
+import json
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
+from . import search
+from .caching import bump_version_on_commit
+from .models import Course
+from .serializers import CourseImportSerializer, ProvisionUserSerializer
+
+
+User = get_user_model()
+
+
+PARSE_ERRORS = (ValueError, UnicodeDecodeError, csv.Error)
+
+COURSE_FIELDS = ['course_name', 'course_type', 'course_unit', 'minimum_credit', 'maximum_credit']
+
+
+def iter_csv_rows(stream):
+    for row in csv.DictReader(stream):
+        yield {key: value for key, value in row.items() if value not in ('', None)}
+
+
+# reads a JSON array of objects (or newline delimited objects) one object at a time
+def iter_json_rows(stream, chunk_size=64 * 1024):
+    decoder = json.JSONDecoder()
+    separators = ' \t\r\n,['
+    buffer, pos, eof = '', 0, False
+    while True:
+        while pos < len(buffer) and buffer[pos] in separators:
+            pos += 1
+        if buffer.startswith(']', pos):
+            return
+        try:
+            row, pos = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                if buffer[pos:].strip():
+                    raise
+                return
+            chunk = stream.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        yield row
+
+
+def iter_rows(stream, filename):
+    if filename.lower().endswith('.csv'):
+        return iter_csv_rows(stream)
+    return iter_json_rows(stream)
+
+
+def _import_batch(batch, report):
+    courses = {}
+    for number, row in batch:
+        serializer = CourseImportSerializer(data=row)
+        if not serializer.is_valid():
+            report['errors'].append({'row': number, 'errors': serializer.errors})
+            continue
+        course = Course(**serializer.validated_data)
+        # a later row for the same course_code and semester wins
+        courses[(course.course_code, course.semester)] = course
+
+    if not courses:
+        return
+
+    codes = {code for code, semester in courses}
+    existing = {}
+    for course in Course.objects.filter(course_code__in=codes).order_by('pk'):
+        existing.setdefault((course.course_code, course.semester), course)
+
+    to_create, to_update = [], []
+    for key, course in courses.items():
+        if key in existing:
+            current = existing[key]
+            for field in COURSE_FIELDS:
+                setattr(current, field, getattr(course, field))
+            to_update.append(current)
+        else:
+            to_create.append(course)
+
+    with transaction.atomic():
+        Course.objects.bulk_create(to_create)
+        Course.objects.bulk_update(to_update, COURSE_FIELDS)
+    # bulk writes skip post_save, so index the batch here
+    search.index_many('course', Course.objects.filter(course_code__in=codes), search.course_document)
+    report['created'] += len(to_create)
+    report['updated'] += len(to_update)
+
+
+# numbered rows in batches, rows that are not objects go straight to the report. Batches are
+# written as they come, so a file that stops parsing halfway ends the run with the rows before it
+# written and the failing row recorded under parse_error, instead of raising and losing the report.
+def _batches(rows, batch_size, report):
+    batch, number = [], 0
+    try:
+        for number, row in enumerate(rows, start=1):
+            if not isinstance(row, dict):
+                report['errors'].append({'row': number, 'errors': 'Expected an object'})
+                continue
+            batch.append((number, row))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    except PARSE_ERRORS as e:
+        report['parse_error'] = {'row': number + 1, 'error': f'Could not parse file: {e}'}
+    if batch:
+        yield batch
+
+
+# upsert courses on (course_code, semester) batch by batch, invalid rows are reported by row number
+def import_courses(rows, batch_size=500):
+    report = {'created': 0, 'updated': 0, 'errors': []}
+    try:
+        for batch in _batches(rows, batch_size, report):
+            _import_batch(batch, report)
+    finally:
+        # bulk writes skip the post_save signal that usually does this
+        if report['created'] or report['updated']:
+            bump_version_on_commit('course_catalogue')
+            bump_version_on_commit('course_registrations')
+    return report
+
+
+def _provision_batch(batch, executor, seen, report):
+    candidates = []
+    for number, row in batch:
+        serializer = ProvisionUserSerializer(data=row)
+        if not serializer.is_valid():
+            report['errors'].append({'row': number, 'errors': serializer.errors})
+            continue
+        candidates.append((number, serializer.validated_data))
+
+    # one query per unique column for the whole batch
+    taken = {}
+    for field in ('username', 'email', 'registration_number'):
+        values = {data[field] for number, data in candidates}
+        taken[field] = set(User.objects.filter(**{f'{field}__in': values}).values_list(field, flat=True))
+
+    accepted = []
+    for number, data in candidates:
+        clashes = {field: 'Already in use' for field in taken
+                   if data[field] in taken[field] or data[field] in seen[field]}
+        if clashes:
+            report['errors'].append({'row': number, 'errors': clashes})
+            continue
+        for field in seen:
+            seen[field].add(data[field])
+        accepted.append((number, data))
+
+    if not accepted:
+        return
+
+    passwords = [data.pop('password') for number, data in accepted]
+    hashes = executor.map(make_password, passwords, chunksize=16)
+    users = [(number, User(password=encoded, **data)) for (number, data), encoded in zip(accepted, hashes)]
+    try:
+        with transaction.atomic():
+            User.objects.bulk_create([user for number, user in users])
+        created = [user for number, user in users]
+    except IntegrityError:
+        # a concurrent signup took a username or email after the batch was checked, so only the
+        # rows that clash are reported and the rest of the batch still goes in
+        created = []
+        for number, user in users:
+            try:
+                with transaction.atomic():
+                    User.objects.bulk_create([user])
+            except IntegrityError:
+                report['errors'].append({'row': number, 'errors': 'Username or email taken while importing'})
+            else:
+                created.append(user)
+    if not created:
+        return
+    # as for courses, bulk_create does not send post_save
+    bump_version_on_commit('user_list')
+    search.index_many('user', User.objects.filter(username__in=[user.username for user in created]),
+                      search.user_document)
+    report['created'] += len(created)
+
+
+def hashing_processes(workers=None):
+    # spawn rather than fork, forking a threaded server process is not safe
+    context = multiprocessing.get_context('spawn')
+    return ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=django.setup)
+
+
+_shared_processes = None
+_shared_processes_lock = threading.Lock()
+
+
+# the server keeps one pool for its lifetime, each spawned worker runs django.setup() and paying
+# for that on every upload would cost more than the hashing it spreads out
+def shared_hashing_processes():
+    global _shared_processes
+    with _shared_processes_lock:
+        if _shared_processes is None:
+            _shared_processes = hashing_processes(getattr(settings, 'PROVISIONING_WORKERS', None))
+        return _shared_processes
+
+
+# create user accounts from a roster, hashing the initial passwords on a process pool
+def provision_users(rows, batch_size=1000, executor=None):
+    report = {'created': 0, 'errors': []}
+    seen = {'username': set(), 'email': set(), 'registration_number': set()}
+    executor = executor or shared_hashing_processes()
+    for batch in _batches(rows, batch_size, report):
+        _provision_batch(batch, executor, seen, report)
+    return report
+
+
+def open_text(fileobj):
+    return io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
@@ -0,0 +1,114 @@
+import asyncio
+import statistics
+import time
+import types
+from asyncio import iscoroutinefunction
+from django.conf import settings
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.db.backends.signals import connection_created
+from django.test.utils import override_settings
+from django.urls import URLPattern, URLResolver, get_resolver
+
+
+# the URLconf with the offloaded (read_view/hashing_view) wrappers taken off, i.e. the plain
+# sync DRF views that every request reaches through sync_to_async
+def _unwrap(patterns):
+    unwrapped = []
+    for pattern in patterns:
+        if isinstance(pattern, URLResolver):
+            unwrapped.append(URLResolver(pattern.pattern, _unwrap(pattern.url_patterns), pattern.default_kwargs,
+                                         pattern.app_name, pattern.namespace))
+        elif iscoroutinefunction(pattern.callback) and hasattr(pattern.callback, '__wrapped__'):
+            unwrapped.append(URLPattern(pattern.pattern, pattern.callback.__wrapped__, pattern.default_args,
+                                        pattern.name))
+        else:
+            unwrapped.append(pattern)
+    return unwrapped
+
+
+def sync_urlconf():
+    module = types.ModuleType('benchmark_sync_urls')
+    module.urlpatterns = _unwrap(get_resolver().url_patterns)
+    return module
+
+
+class Command(BaseCommand):
+    help = ('Drives the ASGI application with concurrent GETs and compares requests/sec of the plain sync '
+            'views with the offloaded async ones, in process, against the configured database')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', action='append', dest='paths',
+                            help='Path to request, repeatable (default /users/all_course_list/)')
+        parser.add_argument('--requests', type=int, default=200, help='Requests per run')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once')
+        parser.add_argument('--query-latency', type=float, default=0,
+                            help='Milliseconds added to every database query, to stand in for a networked database')
+        parser.add_argument('--no-cache', action='store_true',
+                            help='Use a dummy cache so cached list views hit the database on every request')
+
+    def handle(self, *args, **options):
+        paths = options['paths'] or ['/users/all_course_list/']
+        overrides = {'ALLOWED_HOSTS': [*settings.ALLOWED_HOSTS, 'localhost']}
+        if options['no_cache']:
+            overrides['CACHES'] = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+        latency = options['query_latency'] / 1000
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(latency)
+            return execute(sql, params, many, context)
+
+        def add_latency(sender, connection, **kwargs):
+            connection.execute_wrappers.append(slow_query)
+
+        if latency:
+            connection_created.connect(add_latency)
+        try:
+            with override_settings(**overrides):
+                runs = (('sync views', sync_urlconf()), ('offloaded views', settings.ROOT_URLCONF))
+                for name, urlconf in runs:
+                    with override_settings(ROOT_URLCONF=urlconf):
+                        self.report(name, asyncio.run(self.drive(paths, options['requests'],
+                                                                 options['concurrency'])))
+        finally:
+            connection_created.disconnect(add_latency)
+
+    def report(self, name, result):
+        elapsed, latencies, statuses = result
+        if any(status >= 400 for status in statuses):
+            raise CommandError(f'{name}: got responses {sorted(set(statuses))}')
+        latencies.sort()
+        self.stdout.write(f'{name}: {len(latencies) / elapsed:,.1f} req/s, '
+                          f'p50 {statistics.median(latencies) * 1000:.1f}ms, '
+                          f'p95 {latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms')
+
+    async def drive(self, paths, requests, concurrency):
+        application = ASGIHandler()
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies, statuses = [], []
+
+        async def request(number):
+            path, _, query = paths[number % len(paths)].partition('?')
+            scope = {
+                'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+                'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': query.encode(),
+                'root_path': '', 'headers': [(b'host', b'localhost')],
+                'client': ('127.0.0.1', 0), 'server': ('localhost', 80),
+            }
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+
+            async with semaphore:
+                start = time.perf_counter()
+                await application(scope, receive, send)
+                latencies.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(request(number) for number in range(requests)))
+        return time.perf_counter() - start, latencies, statuses
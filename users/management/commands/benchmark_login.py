@@ -0,0 +1,56 @@
+import time
+from django.contrib import auth
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from users.models import CustomUser
+from users.serializers import LoginSerializer
+
+EMAIL = 'benchmark-login@example.com'
+PASSWORD = 'benchmark-password'
+
+
+# the login path before single-pass login: a second user lookup for the tokens and two
+# user.tokens() calls, so two OutstandingToken inserts per login
+def previous_login(email, password):
+    user = auth.authenticate(email=email, password=password)
+    user = CustomUser.objects.get(email=user.email)
+    return {'email': user.email, 'username': user.username,
+            'tokens': {'refresh': user.tokens()['refresh'], 'access': user.tokens()['access']}}
+
+
+def current_login(email, password):
+    serializer = LoginSerializer(data={'email': email, 'password': password})
+    serializer.is_valid(raise_exception=True)
+    return serializer.data
+
+
+class Command(BaseCommand):
+    help = ('Compares logins/sec and queries per login of the previous login path and LoginSerializer, '
+            'the benchmark user and tokens are created in a transaction that is rolled back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--logins', type=int, default=20, help='Logins per path')
+        parser.add_argument('--fast-hashing', action='store_true',
+                            help='Use MD5 password hashing to leave only the lookup and token costs')
+
+    def handle(self, *args, **options):
+        if options['fast_hashing']:
+            with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']):
+                self.run(options['logins'])
+        else:
+            self.run(options['logins'])
+
+    def run(self, logins):
+        with transaction.atomic():
+            CustomUser.objects.create_user('benchmark-login', EMAIL, PASSWORD)
+            for name, login in (('previous', previous_login), ('current', current_login)):
+                login(EMAIL, PASSWORD)
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    for _ in range(logins):
+                        login(EMAIL, PASSWORD)
+                    elapsed = time.perf_counter() - start
+                self.stdout.write(f'{name}: {logins / elapsed:,.1f} logins/sec, '
+                                  f'{len(queries) / logins:.1f} queries per login')
+            transaction.set_rollback(True)
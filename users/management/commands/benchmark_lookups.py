@@ -0,0 +1,82 @@
+import random
+import time
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from users.models import CustomUser
+
+
+# the lookups served by indexes that can be dropped for the comparison, each takes a random seeded
+# row number. Course (course_code, semester) and registration (user, courses_offered) lookups are
+# left out: their unique constraints live in the SQLite table definition, so both runs would use them.
+LOOKUPS = {
+    'user by email (login)': lambda n: CustomUser.objects.filter(email=f'bench{n}@example.com').first(),
+    'user by registration_number': lambda n: CustomUser.objects.filter(registration_number=f'REG{n}').exists(),
+    'advisers by status': lambda n: list(CustomUser.objects.filter(status='Course Adviser')[:20]),
+}
+
+
+class Command(BaseCommand):
+    help = ('Seeds users and times the user lookups with and without their indexes (Meta.indexes and the '
+            'conditional unique email constraint), all in a transaction that is rolled back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100000, help='Users to seed')
+        parser.add_argument('--lookups', type=int, default=500, help='Lookups timed per query')
+
+    def handle(self, *args, **options):
+        users = options['users']
+        with transaction.atomic():
+            start = time.perf_counter()
+            self.seed(users)
+            self.stdout.write(f'seeded {users:,} users in {time.perf_counter() - start:.1f}s')
+
+            rows = [random.randrange(users) for _ in range(options['lookups'])]
+            timed = {name: self.time(lookup, rows, 'with') for name, lookup in LOOKUPS.items()}
+            self.drop_indexes()
+            for name, lookup in LOOKUPS.items():
+                indexed, plan = timed[name]
+                unindexed, unindexed_plan = self.time(lookup, rows, 'without')
+                self.stdout.write(f'{name}: {unindexed * 1e6:,.0f}us without indexes -> {indexed * 1e6:,.0f}us with')
+                self.stdout.write(f'  without: {unindexed_plan}\n  with:    {plan}')
+            transaction.set_rollback(True)
+
+    def seed(self, users):
+        now, password = timezone.now(), make_password(None)
+        CustomUser.objects.bulk_create((
+            CustomUser(username=f'bench{n}', email=f'bench{n}@example.com', password=password, date_joined=now,
+                       registration_number=f'REG{n}',
+                       # advisers are the rare status, as in the admin's list filter
+                       status='Course Adviser' if n % 100 == 0 else 'Student')
+            for n in range(users)
+        ), batch_size=5000)
+
+    def drop_indexes(self):
+        editor = connection.schema_editor()
+        meta = CustomUser._meta
+        dropped = [*meta.indexes, *(constraint for constraint in meta.constraints if constraint.condition is not None)]
+        with connection.cursor() as cursor:
+            for index in dropped:
+                cursor.execute(str(index.remove_sql(CustomUser, editor)))
+
+    def time(self, lookup, rows, phase):
+        lookup(rows[0])
+        start = time.perf_counter()
+        for n in rows:
+            lookup(n)
+        elapsed = (time.perf_counter() - start) / len(rows)
+        return elapsed, self.explain(lookup, rows[0], phase)
+
+    # the database's plan for the lookup's last query, one line
+    def explain(self, lookup, n, phase):
+        queries = []
+        with connection.execute_wrapper(lambda execute, sql, params, many, context:
+                                        queries.append((sql, params)) or execute(sql, params, many, context)):
+            lookup(n)
+        sql, params = queries[-1]
+        with connection.cursor() as cursor:
+            # the phase keeps the statement text apart: sqlite3 reuses a cached EXPLAIN statement
+            # by its text, and that one is not prepared again after the indexes are dropped
+            cursor.execute(f'{connection.ops.explain_prefix} /* {phase} indexes */ {sql}', params)
+            return ' | '.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
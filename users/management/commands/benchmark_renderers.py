@@ -0,0 +1,56 @@
+import time
+from decimal import Decimal
+from io import BytesIO
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from users.models import CustomUser, Course
+from users.renderers import FastJSONParser, FastJSONRenderer, orjson
+from users.serializers import AllCoursesListSerializer, ListUserSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compares the stdlib JSON renderer/parser with the orjson ones on serialized course and user pages'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Rows per payload')
+        parser.add_argument('--repeat', type=int, default=5, help='Runs per renderer, the best one is reported')
+
+    def handle(self, *args, **options):
+        if orjson is None:
+            self.stderr.write('orjson is not installed, FastJSONRenderer uses the stdlib path')
+        rows, repeat = options['rows'], options['repeat']
+        now, password = timezone.now(), make_password(None)
+        courses = AllCoursesListSerializer([
+            Course(id=i, course_code=f'BENCH{i}', course_name=f'Benchmark course {i}', course_unit=Decimal('3.0'))
+            for i in range(rows)
+        ], many=True)
+        users = ListUserSerializer([
+            CustomUser(id=i, username=f'bench{i}', email=f'bench{i}@example.com', password=password,
+                       date_joined=now, last_login=now)
+            for i in range(rows)
+        ], many=True)
+        # unsaved users have no group/permission rows to read
+        users.child.fields.pop('groups')
+        users.child.fields.pop('user_permissions')
+        payloads = {'courses': courses.data, 'users': users.data}
+        for name, data in payloads.items():
+            content = JSONRenderer().render(data)
+            if FastJSONRenderer().render(data) != content:
+                self.stderr.write(f'{name}: FastJSONRenderer output differs from JSONRenderer')
+            render = self.best(repeat, lambda: JSONRenderer().render(data))
+            fast_render = self.best(repeat, lambda: FastJSONRenderer().render(data))
+            parse = self.best(repeat, lambda: JSONParser().parse(BytesIO(content)))
+            fast_parse = self.best(repeat, lambda: FastJSONParser().parse(BytesIO(content)))
+            self.stdout.write(f'{name} ({len(content):,} bytes): render {render * 1000:.1f}ms -> {fast_render * 1000:.1f}ms, '
+                              f'parse {parse * 1000:.1f}ms -> {fast_parse * 1000:.1f}ms')
+
+    def best(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
@@ -0,0 +1,48 @@
+import time
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from users.compiled import compile_serializer
+from users.models import CustomUser, Course
+from users.serializers import AllCoursesListSerializer, ListUserSerializer
+
+
+class Command(BaseCommand):
+    help = ('Compares rows/sec of the regular and compiled serializers for all_course_list/ and list_users/, '
+            'the benchmark rows are created in a transaction that is rolled back')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000, help='Rows per table')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per serializer, the best one is reported')
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        with transaction.atomic():
+            Course.objects.bulk_create(
+                Course(course_code=f'BENCH{i}', course_name=f'Benchmark course {i}', course_unit='3.0',
+                       semester='First Semester', course_type='Core Course')
+                for i in range(rows)
+            )
+            password = make_password(None)
+            CustomUser.objects.bulk_create(
+                CustomUser(username=f'bench{i}', email=f'bench{i}@example.com', password=password)
+                for i in range(rows)
+            )
+            for serializer_class, queryset in ((AllCoursesListSerializer, Course.objects.all()),
+                                               (ListUserSerializer, CustomUser.objects.all())):
+                regular = self.best(repeat, lambda: serializer_class(
+                    serializer_class.setup_eager_loading(queryset.all()), many=True).data)
+                compiled = compile_serializer(serializer_class())
+                fast = self.best(repeat, lambda: compiled.to_representation(list(compiled.values(queryset.all()))))
+                count = queryset.count()
+                self.stdout.write(f'{serializer_class.__name__}: {count / regular:,.0f} rows/sec regular, '
+                                  f'{count / fast:,.0f} rows/sec compiled ({regular / fast:.1f}x)')
+            transaction.set_rollback(True)
+
+    def best(self, repeat, run):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
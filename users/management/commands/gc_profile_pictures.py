@@ -0,0 +1,73 @@
+import posixpath
+from collections import Counter
+from datetime import timedelta
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from users.images import DERIVATIVE_FORMATS, DERIVATIVE_SIZES, derivative_name, ensure_derivatives
+from users.models import StudentProfile, CouncillorProfile
+
+
+MODELS = (StudentProfile, CouncillorProfile)
+
+
+def walk(storage, path):
+    directories, files = storage.listdir(path)
+    for name in files:
+        yield posixpath.join(path, name)
+    for directory in directories:
+        yield from walk(storage, posixpath.join(path, directory))
+
+
+class Command(BaseCommand):
+    help = 'Deletes profile pictures (and their derivatives) that no profile refers to'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rehash', action='store_true',
+                            help='First move pictures stored under upload names to content hashed names')
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deleted')
+        parser.add_argument('--grace', type=int, default=3600,
+                            help='Keep files modified in the last N seconds, an upload may not have saved its profile yet')
+
+    def handle(self, *args, **options):
+        storage = StudentProfile._meta.get_field('profile_picture').storage
+        if options['rehash'] and not options['dry_run']:
+            self.rehash(storage)
+
+        # taken before the references so a picture saved while they are read is still inside the window
+        cutoff = timezone.now() - timedelta(seconds=options['grace'])
+        references = Counter()
+        for model in MODELS:
+            references.update(model.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+                              .values_list('profile_picture', flat=True))
+
+        if not storage.exists(storage.prefix):
+            return
+        deleted = 0
+        for name in walk(storage, storage.prefix):
+            if references[name] or storage.get_modified_time(name) > cutoff:
+                continue
+            deleted += 1
+            self.stdout.write(f'{"Would delete" if options["dry_run"] else "Deleting"} {name}')
+            if not options['dry_run']:
+                storage.delete(name)
+                for size in DERIVATIVE_SIZES:
+                    for output in DERIVATIVE_FORMATS:
+                        default_storage.delete(derivative_name(name, size, output))
+        self.stdout.write(f'{deleted} unreferenced pictures')
+
+    def rehash(self, storage):
+        for model in MODELS:
+            names = model.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True) \
+                .values_list('profile_picture', flat=True).distinct()
+            for name in list(names):
+                if not storage.exists(name):
+                    self.stderr.write(f'Missing file {name}')
+                    continue
+                with storage.open(name) as content:
+                    hashed = storage.save(name, content)
+                if hashed == name:
+                    continue
+                model.objects.filter(profile_picture=name).update(profile_picture=hashed)
+                ensure_derivatives(model.objects.filter(profile_picture=hashed).first().profile_picture)
+                self.stdout.write(f'{name} -> {hashed}')
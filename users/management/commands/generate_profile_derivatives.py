@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from users.images import ensure_derivatives
+from users.models import StudentProfile, CouncillorProfile
+
+
+class Command(BaseCommand):
+    help = 'Creates resized avatar derivatives for profile pictures uploaded before they existed'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate derivatives that already exist')
+
+    def handle(self, *args, **options):
+        for model in (StudentProfile, CouncillorProfile):
+            profiles = model.objects.exclude(profile_picture='').exclude(profile_picture__isnull=True)
+            for profile in profiles.only('pk', 'profile_picture').iterator():
+                ensure_derivatives(profile.profile_picture, options['force'])
+            self.stdout.write(f'Processed {model._meta.verbose_name_plural}')
@@ -0,0 +1,16 @@
+import json
+from django.core.management.base import BaseCommand
+from users.imports import import_courses, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Creates or updates courses from a CSV or JSON file, matched on course_code and semester'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file, or JSON array / newline delimited JSON')
+        parser.add_argument('--batch-size', type=int, default=500, help='Rows validated and written per batch')
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            report = import_courses(iter_rows(stream, options['path']), options['batch_size'])
+        self.stdout.write(json.dumps(report, indent=2))
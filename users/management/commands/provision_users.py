@@ -0,0 +1,18 @@
+import json
+from django.core.management.base import BaseCommand
+from users.imports import hashing_processes, iter_rows, provision_users
+
+
+class Command(BaseCommand):
+    help = 'Creates user accounts from a CSV or JSON roster, hashing passwords across worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV file, or JSON array / newline delimited JSON')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows checked and inserted per batch')
+        parser.add_argument('--workers', type=int, default=None, help='Hashing processes, defaults to the CPU count')
+
+    def handle(self, *args, **options):
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream, \
+                hashing_processes(options['workers']) as executor:
+            report = provision_users(iter_rows(stream, options['path']), options['batch_size'], executor)
+        self.stdout.write(json.dumps(report, indent=2))
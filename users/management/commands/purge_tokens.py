@@ -0,0 +1,20 @@
+import time
+from django.core.management.base import BaseCommand
+from users.tokens import purge_expired_tokens
+
+
+class Command(BaseCommand):
+    help = 'Deletes expired outstanding and blacklisted JWTs in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows deleted per transaction')
+        parser.add_argument('--every', type=int, default=0,
+                            help='Keep running and purge every N seconds instead of once')
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_expired_tokens(options['batch_size'])
+            self.stdout.write(f'Purged {purged} expired tokens')
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from users import search
+from users.models import CustomUser, Course, CouncillorProfile
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full text search index from the user, course and adviser tables'
+
+    def handle(self, *args, **options):
+        if not search.enabled():
+            self.stderr.write('Full text search needs the SQLite database backend')
+            return
+        search.rebuild(CustomUser, Course, CouncillorProfile)
+        self.stdout.write('Search index rebuilt')
@@ -0,0 +1,35 @@
+import sqlite3
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from users.routers import replicas
+
+
+class Command(BaseCommand):
+    help = 'Copies the SQLite primary database into the file-backed replicas (SQLITE_REPLICAS)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--every', type=int, default=0,
+                            help='Keep running and copy every N seconds instead of once, simulating replication lag')
+
+    def handle(self, *args, **options):
+        primary = connections[DEFAULT_DB_ALIAS]
+        if primary.vendor != 'sqlite':
+            raise CommandError('Only SQLite replicas are synced here, other databases replicate on their own')
+        if not replicas():
+            raise CommandError('No replicas configured, set SQLITE_REPLICAS')
+
+        while True:
+            primary.ensure_connection()
+            for alias in replicas():
+                # the online backup API gives a consistent copy while the primary takes writes
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    primary.connection.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(f'Synced {alias}')
+            if not options['every']:
+                break
+            time.sleep(options['every'])
@@ -0,0 +1,37 @@
+import asyncio
+from asgiref.sync import sync_to_async
+from rest_framework.permissions import SAFE_METHODS
+from .routers import pin_to_primary
+
+
+def _pin_writer(request, response):
+    if request.method not in SAFE_METHODS and response.status_code < 400:
+        pin_to_primary(getattr(request, 'user', None))
+
+
+# pins the user to the primary database after a successful write, DRF has set request.user
+# to the token's user by the time the response comes back. Works in both modes so an ASGI
+# chain stays async and the offloaded views keep their own thread pools.
+class ReplicaPinMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # makes asyncio.iscoroutinefunction(self) true, as MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        response = self.get_response(request)
+        _pin_writer(request, response)
+        return response
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if request.method not in SAFE_METHODS:
+            # resolving request.user and the cache write may block, keep them off the event loop
+            await sync_to_async(_pin_writer, thread_sensitive=False)(request, response)
+        return response
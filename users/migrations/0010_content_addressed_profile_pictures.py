@@ -0,0 +1,24 @@
+# Generated by Django 3.2 on 2026-10-18 18:10
+
+from django.db import migrations, models
+import users.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0009_alter_councillorprofile_gender'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='councillorprofile',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, storage=users.storage.ContentAddressedStorage(), upload_to='profile_pics/'),
+        ),
+        migrations.AlterField(
+            model_name='studentprofile',
+            name='profile_picture',
+            field=models.ImageField(blank=True, null=True, storage=users.storage.ContentAddressedStorage(), upload_to='profile_pics/'),
+        ),
+    ]
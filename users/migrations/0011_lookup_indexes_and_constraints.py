@@ -0,0 +1,85 @@
+# Generated by Django 3.2 on 2026-10-18 18:12
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def dedupe_courses(apps, schema_editor):
+    Course = apps.get_model('users', 'Course')
+    CourseRegistration = apps.get_model('users', 'CourseRegistration')
+    Student = apps.get_model('users', 'Student')
+    duplicates = Course.objects.values('course_code', 'semester') \
+        .annotate(keep=Min('id'), rows=Count('id')).filter(rows__gt=1)
+    for duplicate in duplicates:
+        extra = Course.objects.filter(course_code=duplicate['course_code'], semester=duplicate['semester']) \
+            .exclude(id=duplicate['keep'])
+        for registration in CourseRegistration.objects.filter(courses_offered__in=extra):
+            kept = CourseRegistration.objects.filter(user=registration.user_id, courses_offered=duplicate['keep']).first()
+            if kept is None:
+                registration.courses_offered_id = duplicate['keep']
+                registration.save(update_fields=['courses_offered'])
+                continue
+            # the student already registered the course that stays, students cascade from their
+            # registration so point them at the one that is kept
+            Student.objects.filter(course_details=registration).update(course_details=kept)
+            registration.delete()
+        extra.delete()
+
+
+def dedupe_course_registrations(apps, schema_editor):
+    CourseRegistration = apps.get_model('users', 'CourseRegistration')
+    Student = apps.get_model('users', 'Student')
+    duplicates = CourseRegistration.objects.values('user', 'courses_offered') \
+        .annotate(keep=Min('id'), rows=Count('id')).filter(rows__gt=1)
+    for duplicate in duplicates:
+        extra = CourseRegistration.objects.filter(user=duplicate['user'], courses_offered=duplicate['courses_offered']) \
+            .exclude(id=duplicate['keep'])
+        # students cascade from their registration, point them at the row that stays
+        Student.objects.filter(course_details__in=extra).update(course_details=duplicate['keep'])
+        extra.delete()
+
+
+def check_duplicate_emails(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    duplicates = list(CustomUser.objects.exclude(email='').values('email')
+                      .annotate(rows=Count('id')).filter(rows__gt=1).values_list('email', flat=True))
+    if duplicates:
+        # accounts can't be merged automatically, the owners have to be sorted out by hand
+        raise RuntimeError(f'Resolve duplicate user emails before migrating: {", ".join(duplicates)}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0010_content_addressed_profile_pictures'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['email'], name='customuser_email_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['registration_number'], name='customuser_reg_number_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customuser',
+            index=models.Index(fields=['status'], name='customuser_status_idx'),
+        ),
+        migrations.RunPython(dedupe_courses, migrations.RunPython.noop),
+        migrations.RunPython(dedupe_course_registrations, migrations.RunPython.noop),
+        migrations.RunPython(check_duplicate_emails, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='course',
+            constraint=models.UniqueConstraint(fields=('course_code', 'semester'), name='unique_course_code_semester'),
+        ),
+        migrations.AddConstraint(
+            model_name='courseregistration',
+            constraint=models.UniqueConstraint(fields=('user', 'courses_offered'), name='unique_course_registration'),
+        ),
+        migrations.AddConstraint(
+            model_name='customuser',
+            constraint=models.UniqueConstraint(condition=models.Q(_negated=True, email=''), fields=('email',), name='customuser_unique_email'),
+        ),
+    ]
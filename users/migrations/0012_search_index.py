@@ -0,0 +1,58 @@
+from django.db import migrations
+
+# a frozen copy of the table and documents users.search had when this migration was written, later
+# edits to that module must not change what migrating does
+TABLE = 'users_search_index'
+
+CREATE_TABLE = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        kind UNINDEXED, object_id UNINDEXED, title, detail, tokenize='unicode61', prefix='2 3'
+    )
+'''
+
+INSERT_ROW = f'INSERT INTO {TABLE} (kind, object_id, title, detail) VALUES (%s, %s, %s, %s)'
+
+
+def user_rows(user_model):
+    for user in user_model.objects.iterator():
+        yield 'user', user.pk, f'{user.first_name} {user.last_name}'.strip() or user.username, \
+            f'{user.username} {user.registration_number}'
+
+
+def course_rows(course_model):
+    for course in course_model.objects.iterator():
+        yield 'course', course.pk, course.course_name, course.course_code
+
+
+def adviser_rows(councillor_profile_model):
+    for profile in councillor_profile_model.objects.select_related('user').iterator():
+        yield 'adviser', profile.pk, f'{profile.title}. {profile.user.first_name} {profile.user.last_name}', \
+            f'{profile.discipline} {profile.qualification}'
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        cursor.execute(f'DELETE FROM {TABLE}')
+        for rows in (user_rows(apps.get_model('users', 'CustomUser')),
+                     course_rows(apps.get_model('users', 'Course')),
+                     adviser_rows(apps.get_model('users', 'CouncillorProfile'))):
+            cursor.executemany(INSERT_ROW, list(rows))
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {TABLE}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0011_lookup_indexes_and_constraints'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,7 +1,8 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.models import AbstractUser
 from django.db import models
-from rest_framework_simplejwt.tokens import RefreshToken
+from .storage import ContentAddressedStorage
+from .tokens import FilteredRefreshToken
 
 
 class CustomUser(AbstractUser):
@@ -12,11 +13,21 @@ class CustomUser(AbstractUser):
     registration_number = models.CharField(max_length=100)
     status = models.CharField(choices=STATUS, default=STATUS[0], max_length=20)
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            models.Index(fields=['email'], name='customuser_email_idx'),
+            models.Index(fields=['registration_number'], name='customuser_reg_number_idx'),
+            models.Index(fields=['status'], name='customuser_status_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['email'], condition=~models.Q(email=''), name='customuser_unique_email'),
+        ]
+
     def __str__(self):
         return self.username
 
     def tokens(self):
-        refresh = RefreshToken.for_user(self)
+        refresh = FilteredRefreshToken.for_user(self)
         return {
             'refresh': str(refresh),
             'access': str(refresh.access_token)
@@ -43,34 +54,44 @@ class Course(models.Model):
     minimum_credit = models.PositiveIntegerField(default=1)
     maximum_credit = models.PositiveIntegerField(default=1)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['semester', 'course_type'], name='course_semester_type_idx'),
+            models.Index(fields=['course_type'], name='course_type_idx'),
+        ]
+        # the key imports upsert on, its unique index also serves the course_code lookups
+        constraints = [
+            models.UniqueConstraint(fields=['course_code', 'semester'], name='unique_course_code_semester'),
+        ]
+
     def __str__(self):
         return f'{self.course_name} ({self.course_code})'
 
-    def total_course_units(self):
-        return sum(course.each_course_unit() for course in self.courses.all())
-
-    def total_min_credit(self):
-        return sum(course.each_min_credit() for course in self.courses.all())
 
-    def total_max_credit(self):
-        return sum(course.each_max_credit() for course in self.courses.all())
+class CourseRegistrationQuerySet(models.QuerySet):
+    # units and credit limits per student per semester, one aggregate query for any number of students
+    def credit_summary(self):
+        return self.values('user', semester=models.F('courses_offered__semester')).annotate(
+            courses=models.Count('id'),
+            total_units=models.Sum('courses_offered__course_unit'),
+            total_min_credit=models.Sum('courses_offered__minimum_credit'),
+            total_max_credit=models.Sum('courses_offered__maximum_credit'),
+        ).order_by('user', 'semester')
 
 
 class CourseRegistration(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     courses_offered = models.ForeignKey(Course, related_name='course_registration', on_delete=models.CASCADE)
 
-    def __str__(self):
-        return f'{self.courses_offered} offered by {self.user.username}'
+    objects = CourseRegistrationQuerySet.as_manager()
 
-    def each_course_unit(self):
-        return self.courses_offered.course_unit
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'courses_offered'], name='unique_course_registration'),
+        ]
 
-    def each_min_credit(self):
-        return self.courses_offered.minimum_credit
-
-    def each_max_credit(self):
-        return self.courses_offered.maximum_credit
+    def __str__(self):
+        return f'{self.courses_offered} offered by {self.user.username}'
 
 
 # model for students' profile
@@ -88,7 +109,7 @@ class StudentProfile(models.Model):
     address = models.CharField(max_length=250)
     phone_number = models.CharField(max_length=30)
     country = models.CharField(max_length=100)
-    profile_picture = models.ImageField(upload_to='profile_pics/%Y/%m/%d/', null=True, blank=True)
+    profile_picture = models.ImageField(upload_to='profile_pics/', storage=ContentAddressedStorage(), null=True, blank=True)
     created_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
 
@@ -111,6 +132,12 @@ class Student(models.Model):
     course_of_study = models.CharField(max_length=100)
     course_details = models.ForeignKey(CourseRegistration, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['department', 'student_type'], name='student_department_type_idx'),
+            models.Index(fields=['student_type'], name='student_type_idx'),
+        ]
+
     def __str__(self):
         return self.user.username
 
@@ -138,7 +165,7 @@ class CouncillorProfile(models.Model):
     address = models.CharField(max_length=250)
     phone_number = models.CharField(max_length=30)
     country = models.CharField(max_length=100)
-    profile_picture = models.ImageField(upload_to='profile_pics/%Y/%m/%d/', null=True, blank=True)
+    profile_picture = models.ImageField(upload_to='profile_pics/', storage=ContentAddressedStorage(), null=True, blank=True)
     created_date = models.DateTimeField(auto_now_add=True)
     updated_date = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,65 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+
+
+# Under ASGI every sync view shares one thread. Password hashing (PBKDF2) is CPU bound, so the
+# auth endpoints run on their own bounded pool and queue there. The hot read endpoints get a
+# separate pool so they run side by side instead of one at a time, and exports, which read every
+# row, get a small one of their own.
+
+_hashing_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'PASSWORD_HASHING_WORKERS', 4),
+    thread_name_prefix='password-hashing',
+)
+
+_read_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'READ_VIEW_WORKERS', 16),
+    thread_name_prefix='read-view',
+)
+
+_export_executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'EXPORT_VIEW_WORKERS', 2),
+    thread_name_prefix='export-view',
+)
+
+
+def _run_view(view, request, *args, **kwargs):
+    close_old_connections()
+    try:
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+# wrap a sync view as an async view that runs on the given pool
+def offload_view(view, executor):
+    @functools.wraps(view)
+    async def async_view(request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            # under WSGI (and the test client) the handler calls this through async_to_sync, a thread
+            # sensitive call runs the view back on the request's thread with its own connection
+            return await sync_to_async(view)(request, *args, **kwargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(_run_view, view, request, *args, **kwargs))
+
+    return async_view
+
+
+def hashing_view(view):
+    return offload_view(view, _hashing_executor)
+
+
+def read_view(view):
+    return offload_view(view, _read_executor)
+
+
+def export_view(view):
+    return offload_view(view, _export_executor)
@@ -0,0 +1,9 @@
+from rest_framework.pagination import CursorPagination
+
+
+# keyset pagination on the primary key, next/previous are opaque cursors
+
+class IdCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size_query_param = 'page_size'
+    max_page_size = 100
@@ -14,4 +14,7 @@ class IsOnlyAdmin(BasePermission):
 
 class IsOwner(BasePermission):
     def has_object_permission(self, request, view, obj):
+        # user views check the user row itself, everything else is owned through obj.user
+        if isinstance(obj, User):
+            return obj == request.user
         return obj.user == request.user
@@ -0,0 +1,69 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# JSON renderer and parser on orjson with the same output as DRF's stdlib ones. Dates and
+# datetimes (ISO, in TIME_ZONE, 'Z' for UTC), Decimals and every other non JSON type go through
+# DRF's encoder, so they come out exactly as before. Indented output, non compact/unicode
+# settings, a missing orjson and anything orjson rejects (e.g. integers over 64 bits) use the
+# stdlib path. Floats differ in two ways the API never hits (it has no float fields): non
+# finite ones render as null instead of raising and exponents are written 1e20, not 1e+20.
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=self.encoder_class().default, option=ORJSON_OPTIONS)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        # same javascript-safe escaping of U+2028/U+2029 as JSONRenderer
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+# orjson reads integers past 64 bits as floats, bodies with a run of 19+ digits use the stdlib parser.
+# Mapping digits to '0' and everything else to ' ' makes that a plain substring test.
+DIGITS_ONLY = bytes(ord('0') if byte in b'0123456789' else ord(' ') for byte in range(256))
+LONG_DIGIT_RUN = b'0' * 19
+
+
+def _has_long_digit_run(body):
+    return LONG_DIGIT_RUN in body.translate(DIGITS_ONLY)
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        body = stream.read()
+        if orjson is not None and encoding.lower().replace('_', '-') in ('utf-8', 'utf8') \
+                and not _has_long_digit_run(body):
+            try:
+                return orjson.loads(body)
+            except orjson.JSONDecodeError:
+                # let the stdlib parser raise its usual error message
+                pass
+
+        try:
+            parse_constant = json.strict_constant if self.strict else None
+            return json.loads(body.decode(encoding), parse_constant=parse_constant)
+        except ValueError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,69 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Reads go to a replica only while a list/retrieve view handles a safe request (see
+# ReplicaReadMixin), every other read and all writes use the primary. A user who wrote
+# something is pinned to the primary for REPLICA_PIN_SECONDS so they read their own writes.
+
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def read_alias():
+    if _replica_reads.get() and replicas() and not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+        return random.choice(replicas())
+    return DEFAULT_DB_ALIAS
+
+
+@contextmanager
+def replica_reads(enabled):
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def enable_replica_reads():
+    _replica_reads.set(True)
+
+
+def pin_key(user_id):
+    return f'replica_pin:{user_id}'
+
+
+def pin_to_primary(user):
+    if replicas() and user is not None and user.is_authenticated:
+        cache.set(pin_key(user.pk), True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(user):
+    return user.is_authenticated and cache.get(pin_key(user.pk)) is not None
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replicas()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    # replicas get their schema from the primary
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in replicas():
+            return False
+        return None
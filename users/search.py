@@ -0,0 +1,110 @@
+import re
+from django.db import connection, connections
+from .routers import read_alias
+
+
+# One SQLite FTS5 table holds every searchable row. kind and object_id point back at the source
+# row, title/detail are what gets matched and shown. prefix='2 3' keeps short prefix queries fast.
+TABLE = 'users_search_index'
+
+CREATE_TABLE = f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5(
+        kind UNINDEXED, object_id UNINDEXED, title, detail, tokenize='unicode61', prefix='2 3'
+    )
+'''
+
+KINDS = ('user', 'course', 'adviser')
+
+
+def enabled():
+    return connection.vendor == 'sqlite'
+
+
+def user_document(user):
+    return f'{user.first_name} {user.last_name}'.strip() or user.username, \
+        f'{user.username} {user.registration_number}'
+
+
+def course_document(course):
+    return course.course_name, course.course_code
+
+
+def adviser_document(profile):
+    return f'{profile.title}. {profile.user.first_name} {profile.user.last_name}', \
+        f'{profile.discipline} {profile.qualification}'
+
+
+def index(kind, object_id, title, detail):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE kind = %s AND object_id = %s', [kind, object_id])
+        cursor.execute(f'INSERT INTO {TABLE} (kind, object_id, title, detail) VALUES (%s, %s, %s, %s)',
+                       [kind, object_id, title, detail])
+
+
+def remove(kind, object_id):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLE} WHERE kind = %s AND object_id = %s', [kind, object_id])
+
+
+def index_many(kind, objects, document, batch_size=1000):
+    if not enabled():
+        return
+    batch = []
+    for obj in objects:
+        batch.append((kind, obj.pk, *document(obj)))
+        if len(batch) >= batch_size:
+            _write_batch(batch)
+            batch = []
+    _write_batch(batch)
+
+
+def _write_batch(rows):
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        cursor.executemany(f'DELETE FROM {TABLE} WHERE kind = %s AND object_id = %s', [row[:2] for row in rows])
+        cursor.executemany(f'INSERT INTO {TABLE} (kind, object_id, title, detail) VALUES (%s, %s, %s, %s)', rows)
+
+
+# models are passed in so migrations can rebuild from their historical models
+def rebuild(user_model, course_model, councillor_profile_model):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        cursor.execute(f'DELETE FROM {TABLE}')
+    index_many('user', user_model.objects.iterator(), user_document)
+    index_many('course', course_model.objects.iterator(), course_document)
+    index_many('adviser', councillor_profile_model.objects.select_related('user').iterator(), adviser_document)
+
+
+# every word of the query has to match, the last one as a prefix so results show up while typing
+def build_match(query):
+    words = re.findall(r'\w+', query)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words[:-1]] + [f'"{words[-1]}"*']
+    return ' '.join(terms)
+
+
+def search(query, kind=None, limit=20, offset=0):
+    match = build_match(query)
+    if match is None or not enabled():
+        return []
+    sql = f'SELECT kind, object_id, title, detail FROM {TABLE} WHERE {TABLE} MATCH %s'
+    params = [match]
+    if kind is not None:
+        sql += ' AND kind = %s'
+        params.append(kind)
+    sql += f' ORDER BY bm25({TABLE}, 0, 0, 10.0, 1.0) LIMIT %s OFFSET %s'
+    params += [limit, offset]
+    with connections[read_alias()].cursor() as cursor:
+        cursor.execute(sql, params)
+        return [
+            {'kind': row[0], 'id': int(row[1]), 'title': row[2], 'detail': row[3]}
+            for row in cursor.fetchall()
+        ]
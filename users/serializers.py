@@ -1,21 +1,142 @@
 import re
+from django.conf import settings
 from django.contrib import auth
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
+from django.contrib.auth.validators import UnicodeUsernameValidator
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed
-from rest_framework.validators import UniqueValidator
+from rest_framework.validators import UniqueTogetherValidator, UniqueValidator
 from rest_framework_simplejwt.exceptions import TokenError
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from .caching import bump_version_on_commit
+from .images import derivative_urls
 from .models import StudentProfile, CouncillorProfile, Course, CourseRegistration, Student
+from .tokens import FilteredRefreshToken
 
 # Register Serializer for user registration
 
 User = get_user_model()
 
 
+# ?fields=id,user.username and ?expand=profile,course_details.courses_offered as sets of dotted paths,
+# None when the parameter is absent (only read on GET so writes keep their full response)
+def requested_paths(request, param):
+    if request is None or request.method != 'GET' or param not in request.query_params:
+        return None
+    return {path.strip() for path in request.query_params[param].split(',') if path.strip()}
+
+
+def _roots(paths):
+    return {path.split('.', 1)[0] for path in paths}
+
+
+def _subpaths(paths, name):
+    prefix = name + '.'
+    return {path[len(prefix):] for path in paths if path.startswith(prefix)}
+
+
+def _wants(fields, expand, name, expandable):
+    if fields is not None and name not in _roots(fields):
+        return False
+    if not expandable or (fields is None and expand is None):
+        return True
+    # once either parameter is given expansion is opt-in, a nested field selection
+    # (?fields=user.username) counts as asking for that relation
+    return name in _roots(expand or ()) or bool(fields and _subpaths(fields, name))
+
+
+# the fields / expand paths a relation's nested serializer gets, relative to it
+def _child_paths(fields, expand, name):
+    child_fields = None
+    if fields is not None and name not in fields:
+        child_fields = _subpaths(fields, name) or None
+    child_expand = None
+    if fields is not None or expand is not None:
+        child_expand = _subpaths(expand or (), name)
+    return child_fields, child_expand
+
+
+# whether a select/prefetch lookup (course_details__courses_offered) is rendered, walking it through
+# the nested serializers so a relation is fetched only when every step on its path is wanted
+def _wants_lookup(serializer_class, fields, expand, lookup):
+    name, _, rest = lookup.partition('__')
+    expandable = getattr(serializer_class, 'expandable_fields', {})
+    if not _wants(fields, expand, name, name in expandable):
+        return False
+    if not rest or name not in expandable:
+        return True
+    return _wants_lookup(expandable[name], *_child_paths(fields, expand, name), rest)
+
+
+# sparse fieldsets: drops the fields the client did not ask for and renders a relation listed in
+# expandable_fields as its nested serializer only when expanded, otherwise it keeps its plain value.
+# With neither parameter every field is kept and every relation expanded, as before.
+class SparseFieldsMixin:
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.requested_fields
+        if fields is not None:
+            keep = _roots(fields)
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
+
+    def _requested(self, param):
+        if param in self.context:
+            return self.context[param]
+        return requested_paths(self.context.get('request'), param)
+
+    @property
+    def requested_fields(self):
+        return self._requested('fields')
+
+    @property
+    def requested_expand(self):
+        return self._requested('expand')
+
+    def nested_context(self, name):
+        child_fields, child_expand = _child_paths(self.requested_fields, self.requested_expand, name)
+        return {'fields': child_fields, 'expand': child_expand}
+
+    def to_representation(self, instance):
+        response = super().to_representation(instance)
+        fields, expand = self.requested_fields, self.requested_expand
+        for name, serializer_class in self.expandable_fields.items():
+            if name in response and _wants(fields, expand, name, True):
+                response[name] = serializer_class(getattr(instance, name), context=self.nested_context(name)).data
+        return response
+
+
+# declares the related rows a serializer's nested representation reads,
+# list views apply them to their queryset so a page costs a fixed number of queries.
+# Relations the request leaves out through ?fields= / ?expand= are not fetched.
+class EagerLoadingMixin:
+    select_related_fields = ()
+    prefetch_related_fields = ()
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None):
+        fields, expand = requested_paths(request, 'fields'), requested_paths(request, 'expand')
+
+        def wanted(lookups):
+            return [lookup for lookup in lookups if _wants_lookup(cls, fields, expand, lookup)]
+
+        select_related = wanted(cls.select_related_fields)
+        prefetch_related = wanted(cls.prefetch_related_fields)
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+        return queryset
+
+
 # register for all users
-class RegisterSerializer(serializers.ModelSerializer):
+class RegisterSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     email = serializers.EmailField(required=True, validators=[UniqueValidator(queryset=User.objects.all())])
     password = serializers.CharField(write_only=True, required=True, validators=[validate_password])
     password2 = serializers.CharField(write_only=True, required=True)
@@ -49,8 +170,21 @@ class RegisterSerializer(serializers.ModelSerializer):
         return user
 
 
+# one roster row for bulk provisioning, uniqueness is checked per batch by the importer
+class ProvisionUserSerializer(serializers.Serializer):
+    username = serializers.CharField(max_length=150, validators=[UnicodeUsernameValidator()])
+    email = serializers.EmailField()
+    first_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    last_name = serializers.CharField(max_length=150, required=False, allow_blank=True)
+    registration_number = serializers.CharField(max_length=100)
+    status = serializers.ChoiceField(choices=User.STATUS, default='Student')
+    password = serializers.CharField(write_only=True, validators=[validate_password])
+
+
 # list all registered users
-class ListUserSerializer(serializers.ModelSerializer):
+class ListUserSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    prefetch_related_fields = ('groups', 'user_permissions')
+
     class Meta:
         model = User
         fields = '__all__'
@@ -99,7 +233,8 @@ class CreateStudentProfileSerializer(serializers.ModelSerializer):
 '''
 
 
-class CreateStudentProfileSerializer(serializers.ModelSerializer):
+class CreateStudentProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': RegisterSerializer}
     user = serializers.ReadOnlyField(source='user.username')
 
     class Meta:
@@ -111,7 +246,8 @@ class CreateStudentProfileSerializer(serializers.ModelSerializer):
     # for nested serializer
     def to_representation(self, instance):
         response = super().to_representation(instance)
-        response['user'] = RegisterSerializer(instance.user).data
+        if 'profile_picture' in response:
+            response['profile_picture_derivatives'] = derivative_urls(instance.profile_picture, self.context.get('request'))
         return response
 
     def validate(self, attrs):
@@ -124,7 +260,8 @@ class CreateStudentProfileSerializer(serializers.ModelSerializer):
 
 # create councillors profiles
 
-class CreateCouncillorsProfileSerializer(serializers.ModelSerializer):
+class CreateCouncillorsProfileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': RegisterSerializer}
     user = serializers.ReadOnlyField(source='user.username')
 
     class Meta:
@@ -134,7 +271,8 @@ class CreateCouncillorsProfileSerializer(serializers.ModelSerializer):
 
     def to_representation(self, instance):
         response = super().to_representation(instance)
-        response['user'] = RegisterSerializer(instance.user).data
+        if 'profile_picture' in response:
+            response['profile_picture_derivatives'] = derivative_urls(instance.profile_picture, self.context.get('request'))
         return response
 
     def validate(self, attrs):
@@ -166,27 +304,35 @@ class CreateCouncillorsProfileSerializer(serializers.ModelSerializer):
 
 # individual student profile list
 
-class ListStudentProfileSerializer(serializers.ModelSerializer):
+class ListStudentProfileSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': RegisterSerializer}
+    select_related_fields = ('user',)
+
     class Meta:
         model = StudentProfile
         fields = '__all__'
 
     def to_representation(self, instance):
         response = super().to_representation(instance)
-        response['user'] = RegisterSerializer(instance.user).data
+        if 'profile_picture' in response:
+            response['profile_picture_derivatives'] = derivative_urls(instance.profile_picture, self.context.get('request'))
         return response
 
 
 # individual councillor profile list
 
-class ListCouncillorProfileSerializer(serializers.ModelSerializer):
+class ListCouncillorProfileSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': RegisterSerializer}
+    select_related_fields = ('user',)
+
     class Meta:
         model = CouncillorProfile
         fields = '__all__'
 
     def to_representation(self, instance):
         response = super().to_representation(instance)
-        response['user'] = RegisterSerializer(instance.user).data
+        if 'profile_picture' in response:
+            response['profile_picture_derivatives'] = derivative_urls(instance.profile_picture, self.context.get('request'))
         return response
 
 
@@ -331,12 +477,29 @@ class LogoutSerializer(serializers.Serializer):
 
     def save(self, **kwargs):
         try:
-            RefreshToken(self.token).blacklist()
+            FilteredRefreshToken(self.token).blacklist()
 
         except TokenError:
             self.fail('bad_token')
 
 
+# token refresh, checks revocation through the in-process blacklist filter
+class RefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        refresh = FilteredRefreshToken(attrs['refresh'])
+        data = {'access': str(refresh.access_token)}
+
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+
+            refresh.set_jti()
+            refresh.set_exp()
+            data['refresh'] = str(refresh)
+
+        return data
+
+
 class LoginSerializer(serializers.ModelSerializer):
     email = serializers.EmailField(max_length=255, min_length=3)
     password = serializers.CharField(
@@ -347,12 +510,7 @@ class LoginSerializer(serializers.ModelSerializer):
     tokens = serializers.SerializerMethodField()
 
     def get_tokens(self, obj):
-        user = User.objects.get(email=obj['email'])
-
-        return {
-            'refresh': user.tokens()['refresh'],
-            'access': user.tokens()['access']
-        }
+        return obj['tokens']
 
     class Meta:
         model = User
@@ -361,34 +519,27 @@ class LoginSerializer(serializers.ModelSerializer):
     def validate(self, attrs):
         email = attrs.get('email', '')
         password = attrs.get('password', '')
-        filtered_user_by_email = User.objects.filter(email=email)
-        user = auth.authenticate(email=email, password=password)
-
-        #if filtered_user_by_email.exists() and filtered_user_by_email[0].auth_provider != 'email':
-            #raise AuthenticationFailed(
-                #detail='Please continue your login using ' + filtered_user_by_email[0].auth_provider)
+        user = auth.authenticate(self.context.get('request'), email=email, password=password)
 
         if not user:
             raise AuthenticationFailed('Invalid credentials, try again')
         if not user.is_active:
             raise AuthenticationFailed('Account disabled, contact admin')
-        if not user.is_verified:
-            raise AuthenticationFailed('Email is not verified')
 
+        # mint the refresh/access pair once, each RefreshToken is an OutstandingToken insert
         return {
             'email': user.email,
             'username': user.username,
-            'tokens': user.tokens
+            'tokens': user.tokens()
         }
 
-        return super().validate(attrs)
-
 
 # add course serializer
-class CourseSerializer(serializers.ModelSerializer):
+class CourseSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = ('semester', 'course_code', 'course_name', 'course_type', 'course_unit', 'minimum_credit', 'maximum_credit')
+        validators = [UniqueTogetherValidator(queryset=Course.objects.all(), fields=('course_code', 'semester'))]
 
     def create(self, validated_data):
         course = Course.objects.create(
@@ -404,8 +555,14 @@ class CourseSerializer(serializers.ModelSerializer):
         return course
 
 
+# one row of a course import, a known course_code and semester is updated instead of rejected
+class CourseImportSerializer(CourseSerializer):
+    class Meta(CourseSerializer.Meta):
+        validators = []
+
+
 # list all courses
-class AllCoursesListSerializer(serializers.ModelSerializer):
+class AllCoursesListSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
     class Meta:
         model = Course
         fields = '__all__'
@@ -413,18 +570,28 @@ class AllCoursesListSerializer(serializers.ModelSerializer):
 
 # students create course registration
 
-class CourseRegistrationSerializer(serializers.ModelSerializer):
+class CourseRegistrationSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': RegisterSerializer, 'courses_offered': CourseSerializer}
     user = serializers.ReadOnlyField(source='user.username')
 
     class Meta:
         model = CourseRegistration
         fields = ['user', 'courses_offered']
 
-    def to_representation(self, instance):
-        response = super().to_representation(instance)
-        response['user'] = RegisterSerializer(instance.name).data
-        response['courses_offered'] = CourseSerializer(instance.courses_offered).data
-        return response
+    # user is read only, so DRF builds no validator for unique_course_registration
+    def validate_courses_offered(self, value):
+        if CourseRegistration.objects.filter(user=self.context['request'].user, courses_offered=value).exists():
+            raise serializers.ValidationError('Already registered')
+        return value
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError:
+            # a concurrent request registered the course after validation
+            raise serializers.ValidationError({'courses_offered': 'Already registered'})
+
 
 '''
     def create(self, validated_data):
@@ -437,34 +604,109 @@ class CourseRegistrationSerializer(serializers.ModelSerializer):
 '''
 
 
+# register a list of courses at once, all of them or none
+
+class BatchCourseRegistrationSerializer(serializers.Serializer):
+    courses_offered = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=50)
+
+    def validate_courses_offered(self, value):
+        if len(set(value)) != len(value):
+            raise serializers.ValidationError('A course appears more than once')
+        return value
+
+    def validate(self, attrs):
+        user = self.context['request'].user
+        ids = attrs['courses_offered']
+
+        courses = Course.objects.in_bulk(ids)
+        missing = [pk for pk in ids if pk not in courses]
+        if missing:
+            raise serializers.ValidationError({'courses_offered': f'Unknown courses: {missing}'})
+
+        registered = CourseRegistration.objects.filter(user=user, courses_offered__in=ids)
+        already = sorted(registered.values_list('courses_offered', flat=True))
+        if already:
+            raise serializers.ValidationError({'courses_offered': f'Already registered: {already}'})
+
+        attrs['courses'] = [courses[pk] for pk in ids]
+        return attrs
+
+    # Course.minimum_credit/maximum_credit are each course's credit range and credit_summary sums
+    # them per semester, so a semester's registrations carry between total_min_credit and
+    # total_max_credit credits. The most they can carry has to fit MAX_SEMESTER_CREDITS, the
+    # courses themselves name no semester limit. total_min_credit is a floor the student reaches
+    # over several requests, so a partial batch is not held to it.
+    def check_credit_limits(self, user, courses):
+        semesters = {course.semester for course in courses}
+        registered = CourseRegistration.objects.filter(user=user, courses_offered__semester__in=semesters)
+        errors = [
+            f'{row["semester"]} load would be up to {row["total_max_credit"]} credits, '
+            f'allowed at most {settings.MAX_SEMESTER_CREDITS}'
+            for row in registered.credit_summary() if row['total_max_credit'] > settings.MAX_SEMESTER_CREDITS
+        ]
+        if errors:
+            raise serializers.ValidationError({'courses_offered': errors})
+
+    def create(self, validated_data):
+        user = validated_data['user']
+        try:
+            with transaction.atomic():
+                # one batch per student at a time where rows can be locked, SQLite has a single writer
+                User.objects.select_for_update().get(pk=user.pk)
+                CourseRegistration.objects.bulk_create(
+                    CourseRegistration(user=user, courses_offered=course) for course in validated_data['courses']
+                )
+                # checked after the insert, in the same transaction, so the summary includes this
+                # batch and any batch that committed before it. A failure rolls the batch back.
+                self.check_credit_limits(user, validated_data['courses'])
+        except IntegrityError:
+            # a concurrent request registered one of these courses after validation
+            raise serializers.ValidationError({'courses_offered': 'Already registered'})
+        # bulk_create skips the post_save signal that usually does this
+        bump_version_on_commit('course_registrations')
+        return validated_data
+
+    def to_representation(self, instance):
+        return {
+            'user': RegisterSerializer(instance['user']).data,
+            'courses_offered': CourseSerializer(instance['courses'], many=True).data,
+        }
+
+
 # list all course registrations
-class AllCoursesRegistrationListSerializer(serializers.ModelSerializer):
+class AllCoursesRegistrationListSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    expandable_fields = {'user': RegisterSerializer, 'courses_offered': CourseSerializer}
+    select_related_fields = ('user', 'courses_offered')
+
     class Meta:
         model = CourseRegistration
         fields = '__all__'
 
-    def to_representation(self, instance):
-        response = super().to_representation(instance)
-        response['user'] = RegisterSerializer(instance.name).data
-        response['courses_offered'] = CourseSerializer(instance.courses_offered).data
-        return response
+
+# per student, per semester credit load from CourseRegistration.objects.credit_summary()
+class CreditSummarySerializer(serializers.Serializer):
+    user = serializers.IntegerField()
+    semester = serializers.CharField()
+    courses = serializers.IntegerField()
+    total_units = serializers.DecimalField(max_digits=6, decimal_places=1)
+    total_min_credit = serializers.IntegerField()
+    total_max_credit = serializers.IntegerField()
 
 
 # student data serializer for student model
 
-class StudentSerializer(serializers.ModelSerializer):
+class StudentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'user': RegisterSerializer,
+        'profile': CreateStudentProfileSerializer,
+        'course_details': CourseRegistrationSerializer,
+    }
     user = serializers.ReadOnlyField(source='user.username')
 
     class Meta:
         model = Student
         fields = ['user', 'profile', 'department', 'student_type', 'course_of_study', 'course_details']
 
-    def to_representation(self, instance):
-        response = super().to_representation(instance)
-        response['user'] = RegisterSerializer(instance.name).data
-        response['profile'] = CreateStudentProfileSerializer(instance.profile).data
-        response['course_details'] = CourseRegistrationSerializer(instance.course_details).data
-        return response
 
 '''
     def create(self, validated_data):
@@ -482,14 +724,15 @@ class StudentSerializer(serializers.ModelSerializer):
 
 
 # list all students
-class AllStudentSerializer(serializers.ModelSerializer):
+class AllStudentSerializer(SparseFieldsMixin, EagerLoadingMixin, serializers.ModelSerializer):
+    expandable_fields = {
+        'user': RegisterSerializer,
+        'profile': CreateStudentProfileSerializer,
+        'course_details': CourseRegistrationSerializer,
+    }
+    select_related_fields = ('user', 'profile__user', 'course_details__user', 'course_details__courses_offered')
+
     class Meta:
         model = Student
         fields = '__all__'
 
-    def to_representation(self, instance):
-        response = super().to_representation(instance)
-        response['user'] = RegisterSerializer(instance.name).data
-        response['profile'] = CreateStudentProfileSerializer(instance.profile).data
-        response['course_details'] = CourseRegistrationSerializer(instance.course_details).data
-        return response
@@ -0,0 +1,101 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, m2m_changed
+from django.dispatch import receiver
+from django.utils import timezone
+from . import search
+from .authentication import invalidate_cached_user
+from .caching import bump_version_on_commit
+from .images import ensure_derivatives
+from .models import Course, CourseRegistration, StudentProfile, CouncillorProfile
+
+
+User = get_user_model()
+
+
+# drop the cached auth user on any change, password changes and deactivation apply on the next request
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_cached_user(instance.pk)
+
+
+# profiles embed the user row, so touch their updated_date for conditional GETs
+@receiver(post_save, sender=User)
+def touch_user_profiles(sender, instance, created, update_fields=None, **kwargs):
+    if created or update_fields == frozenset({'last_login'}):
+        return
+    now = timezone.now()
+    StudentProfile.objects.filter(user=instance).update(updated_date=now)
+    CouncillorProfile.objects.filter(user=instance).update(updated_date=now)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def user_permissions_changed(sender, instance, **kwargs):
+    if isinstance(instance, User):
+        invalidate_cached_user(instance.pk)
+    bump_version_on_commit('user_list')
+
+
+# any course write invalidates the cached catalogue, and the registration list which embeds courses
+
+@receiver(post_save, sender=Course)
+@receiver(post_delete, sender=Course)
+def course_changed(sender, instance, **kwargs):
+    bump_version_on_commit('course_catalogue')
+    bump_version_on_commit('course_registrations')
+
+
+# the cached user list shows last_login too, the registration list only embeds the RegisterSerializer fields
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_list_changed(sender, instance, update_fields=None, **kwargs):
+    bump_version_on_commit('user_list')
+    if update_fields != frozenset({'last_login'}):
+        bump_version_on_commit('course_registrations')
+
+
+@receiver(post_save, sender=CourseRegistration)
+@receiver(post_delete, sender=CourseRegistration)
+def course_registration_changed(sender, instance, **kwargs):
+    bump_version_on_commit('course_registrations')
+
+
+# resized avatars are made once, when a picture is uploaded
+
+@receiver(post_save, sender=StudentProfile)
+@receiver(post_save, sender=CouncillorProfile)
+def profile_picture_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'profile_picture' in update_fields:
+        ensure_derivatives(instance.profile_picture)
+
+
+# keep the full text search index in step with its source rows
+
+@receiver(post_save, sender=User)
+def index_user(sender, instance, update_fields=None, **kwargs):
+    if update_fields == frozenset({'last_login'}):
+        return
+    search.index('user', instance.pk, *search.user_document(instance))
+    for profile in CouncillorProfile.objects.filter(user=instance):
+        search.index('adviser', profile.pk, *search.adviser_document(profile))
+
+
+@receiver(post_save, sender=Course)
+def index_course(sender, instance, **kwargs):
+    search.index('course', instance.pk, *search.course_document(instance))
+
+
+@receiver(post_save, sender=CouncillorProfile)
+def index_adviser(sender, instance, **kwargs):
+    search.index('adviser', instance.pk, *search.adviser_document(instance))
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Course)
+@receiver(post_delete, sender=CouncillorProfile)
+def unindex(sender, instance, **kwargs):
+    kind = {User: 'user', Course: 'course', CouncillorProfile: 'adviser'}[sender]
+    search.remove(kind, instance.pk)
@@ -0,0 +1,24 @@
+import hashlib
+import posixpath
+from django.core.files.storage import FileSystemStorage
+
+
+# stores each upload under the sha256 of its bytes, so identical pictures share one file
+class ContentAddressedStorage(FileSystemStorage):
+    prefix = 'profile_pics'
+
+    def hashed_name(self, name, content):
+        digest = hashlib.sha256()
+        content.seek(0)
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        digest = digest.hexdigest()
+        extension = posixpath.splitext(name)[1].lower()
+        return posixpath.join(self.prefix, digest[:2], digest[2:4], f'{digest}{extension}')
+
+    def save(self, name, content, max_length=None):
+        name = self.hashed_name(name, content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
@@ -1,3 +1,426 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import gzip
+import io
+import tempfile
+import time
+import uuid
+import zoneinfo
+from decimal import Decimal
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.handlers.asgi import ASGIHandler
+from django.db import connection
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from . import imports
+from .caching import MIN_COMPRESS_LENGTH
+from .images import derivative_name
+from .renderers import FastJSONRenderer
+from .serializers import CourseSerializer, ListUserSerializer
+from .tokens import FilteredRefreshToken, RevokedTokenSet
+from .models import CustomUser, Course, CourseRegistration, Student, StudentProfile
 
-# Create your tests here.
+
+# the nested list endpoints must cost the same number of queries whatever the page size
+class ListQueryCountTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for number in range(20):
+            user = CustomUser.objects.create_user(f'student{number}', f'student{number}@example.com', 'secret123')
+            course = Course.objects.create(course_code=f'CSC{number}', course_name=f'Course {number}',
+                                           course_unit='3.0')
+            profile = StudentProfile.objects.create(user=user, birthday='2000-01-01')
+            registration = CourseRegistration.objects.create(user=user, courses_offered=course)
+            Student.objects.create(user=user, profile=profile, course_details=registration)
+
+    def assertPageQueries(self, url, page_size, queries):
+        cache.clear()
+        with self.assertNumQueries(queries):
+            response = self.client.get(url, {'page_size': page_size})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['results']), page_size)
+
+    def test_list_all_student(self):
+        for page_size in (1, 20):
+            self.assertPageQueries('/users/list_all_student/', page_size, 1)
+
+    def test_list_course_registration(self):
+        for page_size in (1, 20):
+            self.assertPageQueries('/users/list_course_registration/', page_size, 1)
+
+    def assertPageJoins(self, url, params, joined, skipped):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {'page_size': 20, **params})
+        self.assertEqual(len(queries), 1)
+        for table in joined:
+            self.assertIn(f'JOIN "{table}"', queries[0]['sql'])
+        for table in skipped:
+            self.assertNotIn(f'JOIN "{table}"', queries[0]['sql'])
+        return response.json()['results']
+
+    # a dotted ?fields= path nests through relations and joins only the ones on the path
+    def test_fields_select_nested_paths(self):
+        results = self.assertPageJoins('/users/list_all_student/',
+                                       {'fields': 'id,course_details.courses_offered.course_code'},
+                                       joined=['users_courseregistration', 'users_course'],
+                                       skipped=['users_studentprofile', 'users_customuser'])
+        student = results[0]
+        self.assertEqual(set(student), {'id', 'course_details'})
+        self.assertEqual(list(student['course_details']), ['courses_offered'])
+        self.assertEqual(list(student['course_details']['courses_offered']), ['course_code'])
+
+    # with ?expand= a relation that is not listed stays its primary key and is not fetched
+    def test_expand_is_opt_in(self):
+        results = self.assertPageJoins('/users/list_course_registration/', {'expand': 'courses_offered'},
+                                       joined=['users_course'], skipped=['users_customuser'])
+        registration = results[0]
+        self.assertIsInstance(registration['user'], int)
+        self.assertEqual(registration['courses_offered']['course_code'][:3], 'CSC')
+
+
+# the orjson renderer must write the same bytes as DRF's stdlib one for the types the API returns
+class FastJSONRendererTests(SimpleTestCase):
+    def test_matches_json_renderer(self):
+        lagos = zoneinfo.ZoneInfo('Africa/Lagos')
+        data = {
+            'units': [Decimal('3.0'), Decimal('0.10'), Decimal('1E+2'), Decimal('-2.50')],
+            'joined': datetime.datetime(2021, 5, 15, 4, 9, 30, 123456, tzinfo=lagos),
+            'midnight': datetime.datetime(2021, 1, 1, tzinfo=lagos),
+            'utc': datetime.datetime(2021, 5, 15, 3, 9, tzinfo=datetime.timezone.utc),
+            'birthday': datetime.date(2000, 1, 1),
+            'uuid': uuid.UUID(int=1),
+            'nested': {1: 'int key', 'line': 'separator \u2028 here'},
+        }
+        # integers past 64 bits make orjson give up, the fallback has to match as well
+        for payload in (data, {**data, 'big': 2 ** 70}):
+            self.assertEqual(FastJSONRenderer().render(payload), JSONRenderer().render(payload))
+        self.assertIn(b'"2021-05-15T04:09:30.123456+01:00"', FastJSONRenderer().render(data))
+
+    def test_matches_json_renderer_for_serialized_rows(self):
+        course = Course(course_code='CSC1', course_name='Course 1', course_unit=Decimal('3.0'),
+                        semester='First Semester')
+        with timezone.override('Africa/Lagos'):
+            user = ListUserSerializer(CustomUser(username='ada', date_joined=timezone.now())).data
+            rows = [CourseSerializer(course).data, user]
+        self.assertEqual(FastJSONRenderer().render(rows), JSONRenderer().render(rows))
+
+
+# a refresh token blacklisted by another process (a row this process's filter has not seen)
+# is refused once the filter's sync interval has passed
+class FilteredRefreshTokenTests(APITestCase):
+    def setUp(self):
+        patcher = mock.patch('users.tokens.revoked_tokens', RevokedTokenSet(settings.TOKEN_BLACKLIST_SYNC_SECONDS,
+                                                                             settings.TOKEN_BLACKLIST_REBUILD_SECONDS))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = CustomUser.objects.create_user('student', 'student@example.com', 'secret123')
+
+    def refresh(self, token):
+        return self.client.post('/api/token/refresh/', {'refresh': str(token)})
+
+    def test_rejects_token_blacklisted_elsewhere(self):
+        token = FilteredRefreshToken.for_user(self.user)
+        self.assertEqual(self.refresh(token).status_code, 200)
+
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token['jti']))
+        later = time.monotonic() + settings.TOKEN_BLACKLIST_SYNC_SECONDS
+        with mock.patch('users.tokens.time.monotonic', return_value=later):
+            self.assertEqual(self.refresh(token).status_code, 401)
+            self.assertEqual(self.refresh(FilteredRefreshToken.for_user(self.user)).status_code, 200)
+
+    def test_rejects_token_blacklisted_here(self):
+        token = FilteredRefreshToken.for_user(self.user)
+        token.blacklist()
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+
+# registering twice is refused, and a semester's credits are capped over what is already registered
+class CourseRegistrationTests(APITestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('student', 'student@example.com', 'secret123')
+        self.client.force_authenticate(self.user)
+
+    def course(self, number, maximum_credit=1, semester='First Semester'):
+        return Course.objects.create(course_code=f'CSC{number}', course_name=f'Course {number}', course_unit='3.0',
+                                     maximum_credit=maximum_credit, semester=semester).pk
+
+    def register(self, *courses):
+        return self.client.post('/users/register_courses/', {'courses_offered': list(courses)}, format='json')
+
+    def test_single_registration_twice(self):
+        course = self.course(1)
+        for expected in (201, 400):
+            response = self.client.post('/users/register_course/', {'courses_offered': course}, format='json')
+            self.assertEqual(response.status_code, expected)
+
+    def test_default_credits_register(self):
+        response = self.register(self.course(1), self.course(2))
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(CourseRegistration.objects.filter(user=self.user).count(), 2)
+
+    def test_semester_cap_counts_existing_registrations(self):
+        with self.settings(MAX_SEMESTER_CREDITS=6):
+            self.assertEqual(self.register(self.course(1, 4)).status_code, 201)
+            self.assertEqual(self.register(self.course(2, 3)).status_code, 400)
+            self.assertEqual(self.register(self.course(3, 3, 'Second Semester')).status_code, 201)
+            self.assertEqual(self.register(self.course(4, 2)).status_code, 201)
+            # a batch over the cap is rolled back whole
+            self.assertEqual(self.register(self.course(5, 1, 'Second Semester'), self.course(6, 3)).status_code, 400)
+        self.assertEqual(CourseRegistration.objects.filter(user=self.user).count(), 3)
+
+
+# a student without a picture first must not drop the picture columns for the ones after, and a
+# picture whose derivatives were never written gets empty urls rather than ones that 404
+class ExportStudentCsvTests(APITestCase):
+    def test_derivative_columns_survive_missing_picture(self):
+        course = Course.objects.create(course_code='CSC1', course_name='Course 1', course_unit='3.0')
+        pictures = ('', 'profile_pictures/student1.jpg', 'profile_pictures/student2.jpg')
+        for number, picture in enumerate(pictures):
+            user = CustomUser.objects.create_user(f'student{number}', f'student{number}@example.com', 'secret123')
+            profile = StudentProfile.objects.create(user=user, birthday='2000-01-01')
+            # update() skips the signal that would build derivatives from a file that is not there
+            StudentProfile.objects.filter(pk=profile.pk).update(profile_picture=picture)
+            registration = CourseRegistration.objects.create(user=user, courses_offered=course)
+            Student.objects.create(user=user, profile=profile, course_details=registration)
+        admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'secret123')
+        self.client.force_authenticate(admin)
+
+        with tempfile.TemporaryDirectory() as media, self.settings(MEDIA_ROOT=media):
+            default_storage.save(derivative_name(pictures[1], 'thumb', 'jpeg'), ContentFile(b'jpeg'))
+            response = self.client.get('/users/export_students/', {'output': 'csv'})
+            rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        column = next(name for name in rows[0] if name.endswith('profile_picture_derivatives__thumb__jpeg'))
+        self.assertEqual(rows[0][column], '')
+        self.assertTrue(rows[1][column].endswith('student1_thumb.jpg'))
+        self.assertEqual(rows[2][column], '')
+
+
+# the import upserts on course_code and semester, the create endpoint refuses a duplicate
+class CourseImportTests(APITestCase):
+    def setUp(self):
+        self.client.force_authenticate(CustomUser.objects.create_superuser('admin', 'admin@example.com', 'secret123'))
+        self.course = Course.objects.create(course_code='CSC1', course_name='Old', course_unit='3.0',
+                                            semester='First Semester')
+
+    def test_import_updates_existing_course(self):
+        upload = SimpleUploadedFile('courses.csv', b'course_code,semester,course_name,course_unit\n'
+                                                   b'CSC1,First Semester,New,2.0\n'
+                                                   b'CSC2,First Semester,Other,3.0\n')
+        response = self.client.post('/users/import_courses/', {'file': upload})
+        self.assertEqual(response.json(), {'created': 1, 'updated': 1, 'errors': []})
+        self.course.refresh_from_db()
+        self.assertEqual(self.course.course_name, 'New')
+
+    def test_parse_error_keeps_report(self):
+        upload = SimpleUploadedFile('courses.json', b'[{"course_code": "CSC2", "semester": "First Semester", '
+                                                    b'"course_name": "Other", "course_unit": "3.0"}, {"course_')
+        response = self.client.post('/users/import_courses/', {'file': upload})
+        self.assertEqual(response.status_code, 400)
+        report = response.json()
+        self.assertEqual((report['created'], report['parse_error']['row']), (1, 2))
+        self.assertTrue(Course.objects.filter(course_code='CSC2').exists())
+
+    def test_create_rejects_duplicate(self):
+        response = self.client.post('/users/create_course/', {
+            'semester': 'First Semester', 'course_code': 'CSC1', 'course_name': 'Again', 'course_type': 'Core Course',
+            'course_unit': '3.0', 'minimum_credit': 1, 'maximum_credit': 1,
+        })
+        self.assertEqual(response.status_code, 400)
+
+
+# the hashing endpoints are async views, outside ASGI they run inline on the test's connection
+class HashingEndpointTests(APITestCase):
+    password = 'Unusual-pass-42'
+
+    def test_register_login_and_change_password(self):
+        response = self.client.post('/users/register/', {
+            'username': 'student', 'email': 'student@example.com', 'password': self.password,
+            'password2': self.password, 'status': 'Student', 'registration_number': 'REG1',
+            'first_name': 'Ada', 'last_name': 'Obi',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        user = CustomUser.objects.get(username='student')
+
+        response = self.client.post('/users/login/', {'email': 'student@example.com', 'password': 'wrong-pass'},
+                                    format='json')
+        self.assertEqual(response.status_code, 401)
+        response = self.client.post('/users/login/', {'email': 'student@example.com', 'password': self.password},
+                                    format='json')
+        self.assertEqual(response.status_code, 200)
+        self.client.credentials(HTTP_AUTHORIZATION='JWT ' + response.json()['tokens']['access'])
+
+        response = self.client.put(f'/users/change_password/{user.pk}/', {
+            'old_password': self.password, 'password': 'Another-pass-43', 'password2': 'Another-pass-43',
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        user.refresh_from_db()
+        self.assertTrue(user.check_password('Another-pass-43'))
+
+
+# the read endpoints are offloaded too, and answer conditional GETs
+class ReadEndpointTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = CustomUser.objects.create_user('student', 'student@example.com', 'secret123')
+        self.profile = StudentProfile.objects.create(user=self.user, birthday='2000-01-01')
+        Course.objects.create(course_code='CSC1', course_name='Course 1', course_unit='3.0', semester='First Semester')
+
+    def test_course_catalogue_etag(self):
+        response = self.client.get('/users/all_course_list/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([course['course_code'] for course in response.json()['results']], ['CSC1'])
+        etag = response['ETag']
+
+        response = self.client.get('/users/all_course_list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # the catalogue version moves once the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            Course.objects.create(course_code='CSC2', course_name='Course 2', course_unit='3.0',
+                                  semester='First Semester')
+        response = self.client.get('/users/all_course_list/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_student_profile_conditional_get(self):
+        url = f'/users/list_student_profile/{self.profile.pk}/'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['id'], self.profile.pk)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified']).status_code, 304)
+        self.assertEqual(self.client.get('/users/list_student_profile/0/').status_code, 404)
+
+    def test_student_profile_etag_names_representation(self):
+        url = f'/users/list_student_profile/{self.profile.pk}/'
+        sparse = self.client.get(url, {'fields': 'id,user'})
+        self.assertEqual(sparse.json(), {'id': self.profile.pk, 'user': self.user.pk})
+        # the same selection in another order is the same representation
+        self.assertEqual(self.client.get(url, {'fields': 'user, id'})['ETag'], sparse['ETag'])
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=sparse['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('birthday', response.json())
+        html = self.client.get(url, HTTP_ACCEPT='text/html')
+        self.assertNotEqual(html['ETag'], response['ETag'])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=html['ETag']).status_code, 200)
+        self.assertIn('Accept', response['Vary'])
+
+
+# cached list pages are stored compressed per content coding, each coding with its own ETag
+class CompressedListTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for number in range(10):
+            Course.objects.create(course_code=f'CSC{number}', course_name=f'Course {number}', course_unit='3.0',
+                                  semester='First Semester')
+
+    def test_gzip_page(self):
+        plain = self.client.get('/users/all_course_list/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        compressed = self.client.get('/users/all_course_list/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(compressed['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', compressed['Vary'])
+        self.assertEqual(gzip.decompress(compressed.content), plain.content)
+        self.assertNotEqual(compressed['ETag'], plain['ETag'])
+
+        # a hit is served from the cached bytes, and revalidates against its own coding's ETag
+        with self.assertNumQueries(0):
+            again = self.client.get('/users/all_course_list/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(again.content, compressed.content)
+        response = self.client.get('/users/all_course_list/', HTTP_ACCEPT_ENCODING='gzip',
+                                   HTTP_IF_NONE_MATCH=compressed['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_short_page_is_not_compressed(self):
+        response = self.client.get('/users/all_course_list/', {'page_size': 1, 'fields': 'course_code'},
+                                   HTTP_ACCEPT_ENCODING='gzip')
+        self.assertLess(len(response.content), MIN_COMPRESS_LENGTH)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+
+# a GET through Django's own ASGI handler, returns the status and the whole body
+def asgi_get(path, query='', headers=()):
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path, 'raw_path': path.encode(), 'query_string': query.encode(), 'root_path': '',
+        'headers': [(b'host', b'testserver'), *headers], 'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+    }
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(ASGIHandler()(scope, receive, send))
+    body = b''.join(message.get('body', b'') for message in messages[1:])
+    return messages[0]['status'], body
+
+
+# under ASGI the export is written off the event loop, the ORM refuses to run on it.
+# Offloaded views use their own connections, so the rows have to be committed.
+class AsgiExportTests(TransactionTestCase):
+    def test_exports(self):
+        user = CustomUser.objects.create_user('student', 'student@example.com', 'secret123')
+        course = Course.objects.create(course_code='CSC1', course_name='Course 1', course_unit='3.0')
+        profile = StudentProfile.objects.create(user=user, birthday='2000-01-01')
+        registration = CourseRegistration.objects.create(user=user, courses_offered=course)
+        Student.objects.create(user=user, profile=profile, course_details=registration)
+        admin = CustomUser.objects.create_superuser('admin', 'admin@example.com', 'secret123')
+        authorization = (b'authorization', f'JWT {admin.tokens()["access"]}'.encode())
+
+        status, body = asgi_get('/users/export_course_registration/', 'output=ndjson', [authorization])
+        self.assertEqual(status, 200)
+        self.assertEqual(len(body.splitlines()), 1)
+        status, body = asgi_get('/users/export_students/', 'output=csv', [authorization])
+        self.assertEqual(status, 200)
+        self.assertEqual(len(list(csv.DictReader(io.StringIO(body.decode())))), 1)
+
+
+# hashes on the caller's thread and, before that, lets another request sign up one of the roster's users
+class RacingExecutor:
+    def map(self, function, values, chunksize=1):
+        CustomUser.objects.create_user('late', 'late@example.com', 'secret123')
+        return map(function, values)
+
+
+class ProvisionUsersTests(APITestCase):
+    password = 'Unusual-pass-42'
+
+    def row(self, name, **overrides):
+        return {'username': name, 'email': f'{name}@example.com', 'registration_number': f'REG-{name}',
+                'password': self.password, **overrides}
+
+    def test_endpoint_creates_accounts(self):
+        self.client.force_authenticate(CustomUser.objects.create_superuser('admin', 'admin@example.com', 'secret123'))
+        roster = 'username,email,registration_number,password\n' + ''.join(
+            f'student{n},student{n}@example.com,REG{n},{self.password}\n' for n in range(3))
+        upload = SimpleUploadedFile('roster.csv', roster.encode())
+        response = self.client.post('/users/provision_users/', {'file': upload})
+        self.assertEqual(response.json(), {'created': 3, 'errors': []})
+        self.assertTrue(CustomUser.objects.get(username='student2').check_password(self.password))
+
+    def test_concurrent_clash_is_reported(self):
+        rows = [self.row('first'), self.row('late'), self.row('last')]
+        report = imports.provision_users(rows, executor=RacingExecutor())
+        self.assertEqual(report['created'], 2)
+        self.assertEqual([error['row'] for error in report['errors']], [2])
+        self.assertEqual(CustomUser.objects.filter(username__in=['first', 'last']).count(), 2)
@@ -0,0 +1,122 @@
+import hashlib
+import math
+import threading
+import time
+from django.conf import settings
+from django.db import transaction
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+# bloom filter over strings, no false negatives
+class BloomFilter:
+    def __init__(self, capacity, error_rate=0.01):
+        self.capacity = capacity
+        self.size = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], 'little')
+        second = int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hash_count)]
+
+    def add(self, value):
+        positions = self._positions(value)
+        if all(self.bits[p >> 3] & (1 << (p & 7)) for p in positions):
+            return
+        for p in positions:
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[p >> 3] & (1 << (p & 7)) for p in self._positions(value))
+
+
+# in-process copy of the blacklisted jtis. A miss means the token is not revoked and
+# skips the database, a hit falls through to the usual BlacklistedToken query.
+# Tokens blacklisted by another process are picked up within TOKEN_BLACKLIST_SYNC_SECONDS by
+# reading the rows past the highest id seen. A row whose id was allocated before that mark but
+# committed after it (concurrent transactions) is caught by the full rebuild that runs every
+# TOKEN_BLACKLIST_REBUILD_SECONDS, which caps how long such a miss lasts.
+class RevokedTokenSet:
+    def __init__(self, sync_interval, rebuild_interval, capacity=1024):
+        self.sync_interval = sync_interval
+        self.rebuild_interval = rebuild_interval
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._filter = None
+        self._max_id = 0
+        self._checked_at = 0.0
+        self._rebuilt_at = 0.0
+
+    def _rebuild(self, now):
+        bloom = BloomFilter(max(self.capacity, BlacklistedToken.objects.count() * 2))
+        max_id = 0
+        for pk, jti in BlacklistedToken.objects.values_list('pk', 'token__jti').iterator():
+            bloom.add(jti)
+            max_id = max(max_id, pk)
+        self._filter = bloom
+        self._max_id = max_id
+        self._rebuilt_at = now
+
+    def _catch_up(self):
+        for pk, jti in BlacklistedToken.objects.filter(pk__gt=self._max_id).values_list('pk', 'token__jti'):
+            self._filter.add(jti)
+            self._max_id = max(self._max_id, pk)
+
+    def sync(self):
+        now = time.monotonic()
+        if self._filter is not None and now - self._checked_at < self.sync_interval:
+            return
+        with self._lock:
+            if self._filter is None or self._filter.count > self._filter.capacity \
+                    or now - self._rebuilt_at >= self.rebuild_interval:
+                self._rebuild(now)
+            else:
+                self._catch_up()
+            self._checked_at = now
+
+    def add(self, jti):
+        self.sync()
+        with self._lock:
+            self._filter.add(jti)
+
+    def __contains__(self, jti):
+        self.sync()
+        return jti in self._filter
+
+
+revoked_tokens = RevokedTokenSet(getattr(settings, 'TOKEN_BLACKLIST_SYNC_SECONDS', 5),
+                                 getattr(settings, 'TOKEN_BLACKLIST_REBUILD_SECONDS', 300))
+
+
+# refresh token that asks the in-process set before querying the blacklist table
+class FilteredRefreshToken(RefreshToken):
+    def check_blacklist(self):
+        if self.payload[api_settings.JTI_CLAIM] in revoked_tokens:
+            super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        revoked_tokens.add(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+
+# delete expired outstanding tokens and their blacklist rows, batch_size rows per transaction
+def purge_expired_tokens(batch_size=1000):
+    now = aware_utcnow()
+    expired = OutstandingToken.objects.filter(expires_at__lte=now).order_by('pk').values_list('pk', flat=True)
+    purged = 0
+    while True:
+        pks = list(expired[:batch_size])
+        if not pks:
+            return purged
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=pks).delete()
+            OutstandingToken.objects.filter(pk__in=pks).delete()
+        purged += len(pks)
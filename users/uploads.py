@@ -0,0 +1,75 @@
+from io import BytesIO
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+
+
+# room left in the request body for the non-file profile fields
+FORM_OVERHEAD = 64 * 2 ** 10
+
+# how much of the file is kept for reading the image header
+PROBE_BYTES = 256 * 2 ** 10
+
+
+def _reject(message):
+    raise ValidationError({'profile_picture': [message]})
+
+
+# Checks profile_picture while it streams in: the size cap is enforced chunk by chunk and the
+# dimensions are read from the image header, so oversized or bogus files are refused before
+# they are buffered in full or decoded. Placed ahead of Django's own handlers.
+class ProfilePictureUploadHandler(FileUploadHandler):
+    checked_field = 'profile_picture'
+
+    def __init__(self, request=None):
+        super().__init__(request)
+        self.max_bytes = settings.PROFILE_PICTURE_MAX_BYTES
+        self.max_dimension = settings.PROFILE_PICTURE_MAX_DIMENSION
+        self.max_pixels = settings.PROFILE_PICTURE_MAX_PIXELS
+        self.checking = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        if content_length > self.max_bytes + FORM_OVERHEAD:
+            _reject(f'Upload is larger than {self.max_bytes // 2 ** 20} MB')
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.checking = field_name == self.checked_field
+        self.received = 0
+        self.head = bytearray()
+        self.probed = False
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.checking:
+            self.received += len(raw_data)
+            if self.received > self.max_bytes:
+                _reject(f'Image is larger than {self.max_bytes // 2 ** 20} MB')
+            if not self.probed:
+                self.head += raw_data[:PROBE_BYTES - len(self.head)]
+                self.probe(final=len(self.head) >= PROBE_BYTES)
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.checking and not self.probed:
+            self.probe(final=True)
+        return None
+
+    def probe(self, final):
+        try:
+            # Image.open only parses the header, no pixel data is decoded
+            with Image.open(BytesIO(self.head)) as image:
+                width, height = image.size
+        except Image.DecompressionBombError:
+            _reject('Image has too many pixels')
+        except Exception:
+            if final:
+                _reject('Upload a valid image')
+            return
+
+        self.probed = True
+        self.head = bytearray()
+        if max(width, height) > self.max_dimension:
+            _reject(f'Image is larger than {self.max_dimension}px on its longest side')
+        if width * height > self.max_pixels:
+            _reject('Image has too many pixels')
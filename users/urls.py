@@ -1,23 +1,31 @@
 from django.urls import path
 from . import views
+from .offload import export_view, hashing_view, read_view
 
 urlpatterns = [
-    path('register/', views.RegisterView.as_view(), name='register'),
-    path('login/', views.LoginAPIView.as_view(), name='login'),
+    path('register/', hashing_view(views.RegisterView.as_view()), name='register'),
+    path('login/', hashing_view(views.LoginAPIView.as_view()), name='login'),
+    path('provision_users/', hashing_view(views.ProvisionUsersView.as_view()), name='provision_users'),
     path('list_users/', views.ListUserView.as_view(), name='list_user'),
     path('create_student_profile/', views.StudentProfileView.as_view(), name='create_student_profile'),
     path('create_councillor_profile/', views.CouncillorProfileView.as_view(), name='create_councillor_profile'),
-    path('list_student_profile/<int:pk>/', views.ListStudentProfileView.as_view(), name='list_student_profile'),
-    path('list_councillor_profile/<int:pk>/', views.ListCouncillorProfileView.as_view(), name='list_councillor_profile'),
+    path('list_student_profile/<int:pk>/', read_view(views.ListStudentProfileView.as_view()), name='list_student_profile'),
+    path('list_councillor_profile/<int:pk>/', read_view(views.ListCouncillorProfileView.as_view()), name='list_councillor_profile'),
     path('update_user/<int:pk>/', views.UpdateUserView.as_view(), name='update_user'),
     path('update_student_profile/<int:pk>/', views.UpdateStudentProfileView.as_view(), name='update_student_profile'),
     path('update_councillor_profile/<int:pk>/', views.UpdateCouncillorProfileView.as_view(), name='update_councillor_profile'),
-    path('change_password/<int:pk>/', views.ChangePasswordView.as_view(), name='change_password'),
+    path('change_password/<int:pk>/', hashing_view(views.ChangePasswordView.as_view()), name='change_password'),
     path('logout/', views.LogoutView.as_view(), name='logout'),
     path('create_course/', views.CourseView.as_view(), name='create_course'),
-    path('all_course_list/', views.AllCourseListView.as_view(), name='all_course_list'),
+    path('import_courses/', views.CourseImportView.as_view(), name='import_courses'),
+    path('all_course_list/', read_view(views.AllCourseListView.as_view()), name='all_course_list'),
     path('register_course/', views.CourseRegistrationView.as_view(), name='register_course'),
+    path('register_courses/', views.BatchCourseRegistrationView.as_view(), name='register_courses'),
     path('list_course_registration/', views.ListCourseRegistrationView.as_view(), name='list_course_registration'),
+    path('credit_summary/', views.CreditSummaryView.as_view(), name='credit_summary'),
     path('create_student/', views.StudentView.as_view(), name='create_student'),
     path('list_all_student/', views.AllStudentListView.as_view(), name='list_all_student'),
+    path('search/', views.SearchView.as_view(), name='search'),
+    path('export_course_registration/', export_view(views.ExportCourseRegistrationView.as_view()), name='export_course_registration'),
+    path('export_students/', export_view(views.ExportStudentView.as_view()), name='export_students'),
 ]
\ No newline at end of file
@@ -1,19 +1,52 @@
 from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, StreamingHttpResponse
 from django.shortcuts import render
+from django.utils.decorators import method_decorator
 from rest_framework import generics, status
-from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser, SAFE_METHODS
 from rest_framework.response import Response
+from rest_framework_simplejwt.views import TokenRefreshView
+from . import exports, imports, routers, search
+from .caching import VersionedCacheMixin, updated_date_condition
+from .compiled import CompiledListMixin
+from .filters import QueryParamFilterBackend
 from .models import StudentProfile, CouncillorProfile, Course, CourseRegistration, Student
 from .permissions import IsOnlyAdmin, IsOwner
 from .serializers import RegisterSerializer, ListUserSerializer, CreateStudentProfileSerializer, \
     ListStudentProfileSerializer, UpdateStudentProfileSerializer, UpdateUserSerializer, ChangePasswordSerializer, \
     LogoutSerializer, CreateCouncillorsProfileSerializer, ListCouncillorProfileSerializer, \
-    UpdateCouncillorProfileSerializer, LoginSerializer, CourseSerializer, AllCoursesListSerializer, \
-    CourseRegistrationSerializer, AllCoursesRegistrationListSerializer, StudentSerializer, AllStudentSerializer
+    UpdateCouncillorProfileSerializer, LoginSerializer, RefreshSerializer, CourseSerializer, AllCoursesListSerializer, \
+    CourseRegistrationSerializer, BatchCourseRegistrationSerializer, AllCoursesRegistrationListSerializer, \
+    CreditSummarySerializer, StudentSerializer, AllStudentSerializer
+from .uploads import ProfilePictureUploadHandler
 
 User = get_user_model()
 
 
+# applies the serializer's declared eager loading to the view queryset
+class EagerLoadingViewMixin:
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return self.get_serializer_class().setup_eager_loading(queryset, self.request)
+
+
+# list/retrieve views read from a replica when there is one, unless the user has just written
+class ReplicaReadMixin:
+    def dispatch(self, request, *args, **kwargs):
+        with routers.replica_reads(False):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # after authentication, which keeps reading the primary
+        if request.method in SAFE_METHODS and routers.replicas() and not routers.is_pinned(request.user):
+            routers.enable_replica_reads()
+
+
 # user registration view
 
 
@@ -23,15 +56,46 @@ class RegisterView(generics.CreateAPIView):
     serializer_class = RegisterSerializer
 
 
+# bulk account provisioning for admins, upload a CSV or JSON roster as "file". Offloaded to the
+# hashing pool in the URLconf, it waits on the worker processes for the whole roster.
+class ProvisionUsersView(generics.GenericAPIView):
+    permission_classes = (IsAdminUser,)
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': 'Upload a CSV or JSON roster'}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = imports.provision_users(imports.iter_rows(imports.open_text(upload.file), upload.name))
+        # as with course imports, the batches before a parse error are already created
+        if 'parse_error' in report:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
+
 # user list view
-class ListUserView(generics.ListAPIView):
+class ListUserView(ReplicaReadMixin, VersionedCacheMixin, CompiledListMixin, EagerLoadingViewMixin,
+                   generics.ListAPIView):
     queryset = User.objects.all()
+    cache_namespace = 'user_list'
     permission_classes = (AllowAny,)
     serializer_class = ListUserSerializer
+    filter_backends = (QueryParamFilterBackend, OrderingFilter)
+    filter_fields = {'status': 'status', 'registration_number': 'registration_number'}
+    ordering_fields = ('id', 'username')
+    ordering = ('-id',)
+
+
+# installs the streaming profile_picture checks before the request body is parsed
+class ProfilePictureUploadMixin:
+    def initial(self, request, *args, **kwargs):
+        request._request.upload_handlers.insert(0, ProfilePictureUploadHandler(request._request))
+        super().initial(request, *args, **kwargs)
 
 
 # create student profile
-class StudentProfileView(generics.CreateAPIView):
+class StudentProfileView(ProfilePictureUploadMixin, generics.CreateAPIView):
     queryset = StudentProfile.objects.all()
     permission_classes = (AllowAny, )
     serializer_class = CreateStudentProfileSerializer
@@ -41,7 +105,7 @@ class StudentProfileView(generics.CreateAPIView):
 
 
 # create councillor profile
-class CouncillorProfileView(generics.CreateAPIView):
+class CouncillorProfileView(ProfilePictureUploadMixin, generics.CreateAPIView):
     queryset = CouncillorProfile.objects.all()
     permission_classes = (AllowAny, )
     serializer_class = CreateCouncillorsProfileSerializer
@@ -52,14 +116,16 @@ class CouncillorProfileView(generics.CreateAPIView):
 
 
 #list individual student profiles
-class ListStudentProfileView(generics.RetrieveAPIView):
+@method_decorator(updated_date_condition(StudentProfile), name='get')
+class ListStudentProfileView(ReplicaReadMixin, EagerLoadingViewMixin, generics.RetrieveAPIView):
     queryset = StudentProfile.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = ListStudentProfileSerializer
 
 
 #list individual councillor profiles
-class ListCouncillorProfileView(generics.RetrieveAPIView):
+@method_decorator(updated_date_condition(CouncillorProfile), name='get')
+class ListCouncillorProfileView(ReplicaReadMixin, EagerLoadingViewMixin, generics.RetrieveAPIView):
     queryset = CouncillorProfile.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = ListCouncillorProfileSerializer
@@ -73,14 +139,14 @@ class UpdateUserView(generics.UpdateAPIView):
 
 
 #update student profiles
-class UpdateStudentProfileView(generics.UpdateAPIView):
+class UpdateStudentProfileView(ProfilePictureUploadMixin, generics.UpdateAPIView):
     queryset = StudentProfile.objects.all()
     permission_classes = (IsAuthenticated, IsOwner)
     serializer_class = UpdateStudentProfileSerializer
 
 
 #update councillor profiles
-class UpdateCouncillorProfileView(generics.UpdateAPIView):
+class UpdateCouncillorProfileView(ProfilePictureUploadMixin, generics.UpdateAPIView):
     queryset = CouncillorProfile.objects.all()
     permission_classes = (IsAuthenticated, IsOwner)
     serializer_class = UpdateCouncillorProfileSerializer
@@ -107,14 +173,20 @@ class LogoutView(generics.GenericAPIView):
     
     
 class LoginAPIView(generics.GenericAPIView):
+    permission_classes = (AllowAny,)
     serializer_class = LoginSerializer
 
     def post(self, request):
-        serializer = self.serializer_class(data=request.data)
+        serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
 
+# token refresh view
+class RefreshTokenView(TokenRefreshView):
+    serializer_class = RefreshSerializer
+
+
 # create course view
 class CourseView(generics.CreateAPIView):
     queryset = Course.objects.all()
@@ -122,11 +194,34 @@ class CourseView(generics.CreateAPIView):
     serializer_class = CourseSerializer
 
 
+# bulk course import for admins, upload a CSV or JSON file as "file"
+class CourseImportView(generics.GenericAPIView):
+    permission_classes = (IsAdminUser,)
+    parser_classes = (MultiPartParser,)
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'file': 'Upload a CSV or JSON file'}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = imports.import_courses(imports.iter_rows(imports.open_text(upload.file), upload.name))
+        # the batches before a parse error are written, the report says up to which row
+        if 'parse_error' in report:
+            return Response(report, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
+
 # all courses list view
-class AllCourseListView(generics.ListAPIView):
+class AllCourseListView(ReplicaReadMixin, VersionedCacheMixin, CompiledListMixin, EagerLoadingViewMixin,
+                        generics.ListAPIView):
     queryset = Course.objects.all()
+    cache_namespace = 'course_catalogue'
     permission_classes = (AllowAny,)
     serializer_class = AllCoursesListSerializer
+    filter_backends = (QueryParamFilterBackend, OrderingFilter)
+    filter_fields = {'semester': 'semester', 'course_type': 'course_type', 'course_code': 'course_code'}
+    ordering_fields = ('id', 'course_code')
+    ordering = ('-id',)
 
 
 # create course registration view
@@ -138,14 +233,45 @@ class CourseRegistrationView(generics.CreateAPIView):
     def perform_create(self, serializer):
         # add status options to user: student  or adviser
         # add if user.status = student or adviser
-        serializer.save(name=self.request.user)
+        serializer.save(user=self.request.user)
+
+
+# register several courses in one request
+class BatchCourseRegistrationView(generics.CreateAPIView):
+    queryset = CourseRegistration.objects.all()
+    permission_classes = (IsAuthenticated,)
+    serializer_class = BatchCourseRegistrationSerializer
+
+    def perform_create(self, serializer):
+        serializer.save(user=self.request.user)
 
 
 # all courses list view
-class ListCourseRegistrationView(generics.ListAPIView):
+class ListCourseRegistrationView(ReplicaReadMixin, VersionedCacheMixin, EagerLoadingViewMixin, generics.ListAPIView):
     queryset = CourseRegistration.objects.all()
+    cache_namespace = 'course_registrations'
     permission_classes = (AllowAny,)
     serializer_class = AllCoursesRegistrationListSerializer
+    filter_backends = (QueryParamFilterBackend, OrderingFilter)
+    filter_fields = {'user': 'user', 'course': 'courses_offered', 'semester': 'courses_offered__semester'}
+    ordering_fields = ('id',)
+    ordering = ('-id',)
+
+
+# credit load per student and semester, ?user=<id> narrows it to one student
+class CreditSummaryView(ReplicaReadMixin, generics.ListAPIView):
+    permission_classes = (AllowAny,)
+    serializer_class = CreditSummarySerializer
+    pagination_class = None
+
+    def get_queryset(self):
+        queryset = CourseRegistration.objects.all()
+        user = self.request.query_params.get('user')
+        if user is not None:
+            if not user.isdigit():
+                raise ValidationError({'user': 'Enter a valid user id'})
+            queryset = queryset.filter(user=user)
+        return queryset.credit_summary()
 
 
 # create student view
@@ -155,11 +281,83 @@ class StudentView(generics.CreateAPIView):
     serializer_class = StudentSerializer
 
     def perform_create(self, serializer):
-        serializer.save(name=self.request.user)
+        serializer.save(user=self.request.user)
 
 
 # all student view
-class AllStudentListView(generics.ListAPIView):
+class AllStudentListView(ReplicaReadMixin, EagerLoadingViewMixin, generics.ListAPIView):
     queryset = Student.objects.all()
     permission_classes = (AllowAny,)
     serializer_class = AllStudentSerializer
+    filter_backends = (QueryParamFilterBackend, OrderingFilter)
+    filter_fields = {'user': 'user', 'department': 'department', 'student_type': 'student_type'}
+    ordering_fields = ('id',)
+    ordering = ('-id',)
+
+
+
+# streaming exports for registrars, rows are read and written in chunks. Django 3.2's ASGI handler
+# iterates streaming content on the event loop, where the queryset can't run, so under ASGI the
+# file is written out first, on the export pool, and served from there.
+class ExportView(ReplicaReadMixin, EagerLoadingViewMixin, generics.GenericAPIView):
+    permission_classes = (IsAdminUser,)
+    chunk_size = 500
+    filename = 'export'
+
+    def get(self, request):
+        output = request.query_params.get('output', 'ndjson')
+        if output not in exports.STREAMERS:
+            return Response({'output': f'Choose one of {", ".join(exports.STREAMERS)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # the rows stream after the view returns, so the database is chosen here
+        queryset = self.get_queryset().using(routers.read_alias()).order_by('pk').iterator(chunk_size=self.chunk_size)
+        rows = (self.get_serializer(instance).data for instance in queryset)
+        chunks = exports.STREAMERS[output](rows)
+        filename = f'{self.filename}.{output}'
+        if isinstance(request._request, ASGIRequest):
+            return FileResponse(exports.spool(chunks), as_attachment=True, filename=filename,
+                                content_type=exports.CONTENT_TYPES[output])
+        response = StreamingHttpResponse(chunks, content_type=exports.CONTENT_TYPES[output])
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+
+# export all course registrations
+class ExportCourseRegistrationView(ExportView):
+    queryset = CourseRegistration.objects.all()
+    serializer_class = AllCoursesRegistrationListSerializer
+    filename = 'course_registrations'
+
+
+# export all students
+class ExportStudentView(ExportView):
+    queryset = Student.objects.all()
+    serializer_class = AllStudentSerializer
+    filename = 'students'
+
+
+
+# full text search over users, courses and advisers, ?q= with optional ?kind=, ?limit= and ?offset=
+class SearchView(ReplicaReadMixin, generics.GenericAPIView):
+    permission_classes = (AllowAny,)
+    max_limit = 50
+
+    def get(self, request):
+        query = request.query_params.get('q', '')
+        kind = request.query_params.get('kind')
+        if kind is not None and kind not in search.KINDS:
+            raise ValidationError({'kind': f'Choose one of {", ".join(search.KINDS)}'})
+        try:
+            limit = min(int(request.query_params.get('limit', 20)), self.max_limit)
+            offset = int(request.query_params.get('offset', 0))
+        except ValueError:
+            raise ValidationError({'limit': 'limit and offset must be numbers'})
+        if limit < 1 or offset < 0:
+            raise ValidationError({'limit': 'limit must be positive and offset not negative'})
+
+        results = search.search(query, kind, limit + 1, offset)
+        return Response({
+            'next_offset': offset + limit if len(results) > limit else None,
+            'results': results[:limit],
+        })